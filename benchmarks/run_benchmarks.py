@@ -0,0 +1,382 @@
+"""Repeatable benchmarks for the mixer's hot paths.
+
+Covers mixing (scalar and batch), palette persistence (load and single-entry saves), Excel export,
+imports (CSV and the Excel export read back), palette filter searches and, when a display is available
+(a real one or Xvfb via DISPLAY), the Tk paths update_color_preview, populate_saved_colors_display,
+toggle_favorite_color and uncached gamut map renders on a withdrawn root window. Every benchmark runs
+on synthetic palettes of each --sizes entry and reports throughput, latency percentiles and peak Python
+memory (tracemalloc, measured in a separate pass so it does not skew timings).
+
+    python benchmarks/run_benchmarks.py                      # run and compare to benchmarks/baseline.json
+    python benchmarks/run_benchmarks.py --update-baseline    # store this machine's results as the baseline
+    xvfb-run python benchmarks/run_benchmarks.py --sizes 100 10000
+
+Exits with status 1 when a result (p50 or p95 latency, throughput or peak memory) regresses past
+--tolerance relative to the baseline.
+"""
+import argparse
+import csv
+import gc
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import numpy as np
+
+from laasti_core import PIGMENT_ORDER, calculate_mixed_color, calculate_mixed_colors_batch, rgb_to_hex
+from palette_export import write_palette_xlsx
+from palette_import import read_palette_import
+from palette_search import PaletteFilter, PaletteSearchIndex
+from palette_store import PaletteStore
+
+DEFAULT_SIZES = [100, 10_000, 100_000]
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+DEFAULT_TOLERANCE = 0.25  # Allowed slowdown (and throughput or memory loss) relative to the baseline
+MEMORY_NOISE_MB = 0.5  # Peak memory growth below this never counts as a regression, whatever the ratio
+MAX_TIMED_OPS = 2_000  # Per-op latency samples taken for the per-call benchmarks
+SEARCH_QUERIES = ["#b", "#b08", "P.Bk.11 > 2%", "Caput Mortuum 1-3% P.Y.42 < 5", "fav", "2024-01-02..2024-01-09",
+                  "P.R.101 > 0 P.Y.42 > 0 P.Bk.11 > 0", "fav #c"]  # As typed into the palette filter bar
+
+
+def synthetic_palette(size, seed=1234):
+    """Deterministic palette entries shaped like the ones PigmentMixerApp saves."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    entries = []
+    for i in range(size):
+        recipe = {key: round(rng.uniform(0, 10), 1) if rng.random() < 0.7 else 0.0 for key in PIGMENT_ORDER}
+        rgb = calculate_mixed_color(recipe)
+        entries.append({"id": str(uuid.UUID(int=rng.getrandbits(128))), "recipe": recipe, "rgb": list(rgb),
+                        "hex": rgb_to_hex(rgb), "favorite": rng.random() < 0.1,
+                        "timestamp": (start + timedelta(seconds=37 * i)).isoformat()})
+    return entries
+
+
+def synthetic_recipe_array(size, seed=1234):
+    return np.round(np.random.default_rng(seed).uniform(0, 10, (size, len(PIGMENT_ORDER))), 1)
+
+
+def synthetic_recipes(size):
+    return [dict(zip(PIGMENT_ORDER, row)) for row in synthetic_recipe_array(size).tolist()]
+
+
+class Benchmark:
+    """A named benchmark. setup(size) returns the state; run(state) performs the work and returns
+    (ops, latencies) where latencies holds per-op samples in seconds (or None for a single op)."""
+
+    def __init__(self, name, setup, run, teardown=None, sizes=None):
+        self.name, self.setup, self.run, self.teardown, self.sizes = name, setup, run, teardown, sizes
+
+
+def _time_each(items, fn):
+    latencies = []
+    for item in items:
+        start = time.perf_counter()
+        fn(item)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+# --- Headless benchmarks ---
+def bench_mix_scalar(recipes):
+    return len(recipes), _time_each(recipes, calculate_mixed_color)
+
+
+def bench_mix_batch(array):
+    start = time.perf_counter()
+    calculate_mixed_colors_batch(array)
+    return len(array), [time.perf_counter() - start]
+
+
+def setup_store(size):
+    tmp_dir = Path(tempfile.mkdtemp(prefix="laasti_bench_"))
+    store = PaletteStore(tmp_dir / "palette.sqlite3")
+    entries = synthetic_palette(size)
+    store.write(entries)
+    return {"dir": tmp_dir, "store": store, "entries": entries}
+
+
+def teardown_store(state):
+    state["store"].close()
+    shutil.rmtree(state["dir"], ignore_errors=True)
+
+
+def bench_store_load(state):
+    start = time.perf_counter()
+    loaded = {c['id']: c for c in state["store"].iter_sorted()}
+    return len(loaded), [time.perf_counter() - start]
+
+
+def bench_store_save_one(state):
+    """The save_colors_to_file path for a single favorite toggle."""
+    sample = state["entries"][:MAX_TIMED_OPS]
+
+    def toggle(entry):
+        entry['favorite'] = not entry['favorite']
+        state["store"].write([entry])
+    return len(sample), _time_each(sample, toggle)
+
+
+def setup_export(size):
+    tmp_dir = Path(tempfile.mkdtemp(prefix="laasti_bench_"))
+    return {"dir": tmp_dir, "entries": synthetic_palette(size)}
+
+
+def teardown_export(state):
+    shutil.rmtree(state["dir"], ignore_errors=True)
+
+
+def bench_export(state):
+    start = time.perf_counter()
+    write_palette_xlsx(state["dir"] / "export.xlsx", state["entries"])
+    return len(state["entries"]), [time.perf_counter() - start]
+
+
+def setup_import_csv(size):
+    state = setup_export(size)
+    state["path"] = state["dir"] / "import.csv"
+    with open(state["path"], 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "timestamp", "favorite"] + [f"{key} (%)" for key in PIGMENT_ORDER])
+        for entry in state["entries"]:
+            writer.writerow([entry['id'], entry['timestamp'], int(entry['favorite'])] +
+                            [entry['recipe'][key] for key in PIGMENT_ORDER])
+    return state
+
+
+def setup_import_xlsx(size):
+    state = setup_export(size)
+    state["path"] = state["dir"] / "import.xlsx"
+    write_palette_xlsx(state["path"], state["entries"])
+    return state
+
+
+def bench_import(state):
+    """Read, mix and dedupe a whole file, as the import worker does before handing entries to the writer."""
+    start = time.perf_counter()
+    entries, rows_read, _ = read_palette_import(state["path"])
+    return rows_read, [time.perf_counter() - start]
+
+
+def setup_search(size):
+    index = PaletteSearchIndex()
+    index.rebuild(synthetic_palette(size))
+    return index
+
+
+def bench_search(index):
+    """Keystroke to ordered result list in the palette filter bar: parse plus search."""
+    queries = SEARCH_QUERIES * 10
+    return len(queries), _time_each(queries, lambda text: index.search(PaletteFilter.parse(text)))
+
+
+# --- Tk benchmarks (need a display; the root window stays withdrawn) ---
+def setup_app(size):
+    import tkinter as tk
+    import laastigithub
+
+    state = setup_store(size)
+    state["store"].close()
+    (state["dir"] / laastigithub.APP_DATA_SUBFOLDER_NAME).mkdir()
+    shutil.move(str(state["dir"] / "palette.sqlite3"),
+                str(state["dir"] / laastigithub.APP_DATA_SUBFOLDER_NAME / laastigithub.PALETTE_DB_FILE_NAME))
+    laastigithub.USER_DOWNLOADS_DIR = state["dir"]
+    laastigithub.DEFAULT_SAVE_DIR = state["dir"] / laastigithub.APP_DATA_SUBFOLDER_NAME
+    laastigithub.messagebox.showinfo = lambda *args, **kwargs: None  # Never block on a dialog
+    root = tk.Tk()
+    root.withdraw()
+    state.update(root=root, app=laastigithub.PigmentMixerApp(root))
+    root.update()
+    return state
+
+
+def teardown_app(state):
+    state["app"].palette_writer.close()
+    state["root"].destroy()
+    shutil.rmtree(state["dir"], ignore_errors=True)
+
+
+def bench_update_color_preview(state):
+    app, recipes = state["app"], synthetic_recipe_array(MAX_TIMED_OPS).tolist()
+
+    def redraw(recipe):
+        for key, value in zip(PIGMENT_ORDER, recipe):
+            app.pigment_vars[key].set(value)
+        app.update_color_preview()
+        app.root.update_idletasks()
+    return len(recipes), _time_each(recipes, redraw)
+
+
+def bench_populate_saved_colors_display(state):
+    app = state["app"]
+
+    def populate(_):
+        app.populate_saved_colors_display()
+        app.root.update_idletasks()
+    return 20, _time_each(range(20), populate)
+
+
+def bench_toggle_favorite(state):
+    app = state["app"]
+    color_ids = list(app.saved_colors)[:200]
+
+    def toggle(color_id):
+        app.toggle_favorite_color(color_id)
+        app.root.update_idletasks()
+    return len(color_ids), _time_each(color_ids, toggle)
+
+
+def bench_gamut_map(state):
+    """Uncached gamut map renders: each step moves a fixed slider to a value not shown before."""
+    app = state["app"]
+    app.open_gamut_map()
+    x_key, y_key = app._gamut_axes()
+    fixed_key = next(key for key in PIGMENT_ORDER if key not in (x_key, y_key))
+    steps = [i / 10 for i in range(1, 51)]
+
+    def render(value):
+        app.pigment_vars[fixed_key].set(value)
+        app.update_color_preview()
+        app.root.update_idletasks()
+    return len(steps), _time_each(steps, render)
+
+
+HEADLESS_BENCHMARKS = [
+    Benchmark("mix_scalar", synthetic_recipes, bench_mix_scalar),
+    Benchmark("mix_batch", synthetic_recipe_array, bench_mix_batch),
+    Benchmark("store_load", setup_store, bench_store_load, teardown_store),
+    Benchmark("store_save_one", setup_store, bench_store_save_one, teardown_store),
+    Benchmark("export_xlsx", setup_export, bench_export, teardown_export),
+    Benchmark("import_csv", setup_import_csv, bench_import, teardown_export),
+    Benchmark("import_xlsx", setup_import_xlsx, bench_import, teardown_export),
+    Benchmark("palette_search", setup_search, bench_search),
+]
+GUI_BENCHMARKS = [
+    Benchmark("update_color_preview", setup_app, bench_update_color_preview, teardown_app, sizes=[100]),
+    Benchmark("populate_saved_colors_display", setup_app, bench_populate_saved_colors_display, teardown_app),
+    Benchmark("toggle_favorite", setup_app, bench_toggle_favorite, teardown_app),
+    Benchmark("gamut_map", setup_app, bench_gamut_map, teardown_app, sizes=[100]),
+]
+
+
+def display_available():
+    if sys.platform.startswith("win") or sys.platform == "darwin":
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def run_benchmark(bench, size, repeat):
+    durations, samples, ops = [], [], 0
+    for _ in range(repeat):
+        state = bench.setup(size)
+        try:
+            gc.collect()
+            start = time.perf_counter()
+            ops, latencies = bench.run(state)
+            durations.append(time.perf_counter() - start)
+            samples.extend(latencies)
+        finally:
+            if bench.teardown:
+                bench.teardown(state)
+
+    state = bench.setup(size)
+    try:
+        gc.collect()
+        tracemalloc.start()
+        bench.run(state)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    finally:
+        if bench.teardown:
+            bench.teardown(state)
+
+    best = min(durations)
+    latencies_ms = np.array(samples) * 1000.0
+    return {"ops": ops, "best_seconds": best, "ops_per_second": ops / best if best > 0 else None,
+            "p50_ms": float(np.percentile(latencies_ms, 50)), "p95_ms": float(np.percentile(latencies_ms, 95)),
+            "p99_ms": float(np.percentile(latencies_ms, 99)), "peak_memory_mb": peak / (1024 * 1024)}
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """Returns human-readable regressions: p50 or p95 latency or peak memory up, or throughput down, by more
+    than tolerance. Peak memory also has to grow by MEMORY_NOISE_MB, so sub-MB allocation jitter passes."""
+    regressions = []
+    for key, result in results.items():
+        reference = baseline.get(key)
+        if not reference:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            if reference.get(metric) is not None and result[metric] > reference[metric] * (1 + tolerance):
+                regressions.append(f"{key}: {metric[:3]} {result[metric]:.3f} ms vs baseline "
+                                   f"{reference[metric]:.3f} ms")
+        if reference.get("ops_per_second") and result["ops_per_second"] is not None and \
+                result["ops_per_second"] < reference["ops_per_second"] * (1 - tolerance):
+            regressions.append(f"{key}: {result['ops_per_second']:,.0f} ops/s vs baseline "
+                               f"{reference['ops_per_second']:,.0f} ops/s")
+        peak, reference_peak = result["peak_memory_mb"], reference.get("peak_memory_mb")
+        if reference_peak is not None and peak > reference_peak * (1 + tolerance) and \
+                peak - reference_peak > MEMORY_NOISE_MB:
+            regressions.append(f"{key}: peak memory {peak:.1f} MB vs baseline {reference_peak:.1f} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the pigment mixer's hot paths.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="synthetic palette sizes")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per benchmark; the best one is reported")
+    parser.add_argument("--only", nargs="+", help="run only benchmarks with these names")
+    parser.add_argument("--no-gui", action="store_true", help="skip the Tk benchmarks")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--update-baseline", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--output", type=Path, help="also write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    benchmarks = list(HEADLESS_BENCHMARKS)
+    if not args.no_gui and display_available():
+        benchmarks += GUI_BENCHMARKS
+    elif not args.no_gui:
+        print("No display found (set DISPLAY or use xvfb-run); skipping Tk benchmarks.", file=sys.stderr)
+    if args.only:
+        benchmarks = [b for b in benchmarks if b.name in args.only]
+
+    results = {}
+    print(f"{'benchmark':<42}{'ops/s':>14}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}{'peak MB':>10}")
+    for bench in benchmarks:
+        for size in (bench.sizes or args.sizes):
+            key = f"{bench.name}[{size}]"
+            result = results[key] = run_benchmark(bench, size, args.repeat)
+            rate = f"{result['ops_per_second']:,.0f}" if result["ops_per_second"] else "-"
+            print(f"{key:<42}{rate:>14}{result['p50_ms']:>11.3f}{result['p95_ms']:>11.3f}"
+                  f"{result['p99_ms']:>11.3f}{result['peak_memory_mb']:>10.1f}", flush=True)
+
+    if args.output:
+        args.output.write_text(json.dumps(results, indent=2))
+    if args.update_baseline:
+        baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {}
+        baseline.update(results)
+        args.baseline.write_text(json.dumps(baseline, indent=2, sort_keys=True))
+        print(f"Baseline written to {args.baseline}")
+        return 0
+    if not args.baseline.exists():
+        print(f"No baseline at {args.baseline}; run with --update-baseline to record one.")
+        return 0
+
+    regressions = compare_to_baseline(results, json.loads(args.baseline.read_text()), args.tolerance)
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
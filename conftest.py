@@ -0,0 +1,25 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from laasti_core import DEFAULT_REGISTRY, calculate_mixed_color, rgb_to_hex
+
+
+def _make_palette(size, seed=7):
+    """size saved entries with random recipes, one minute apart, every seventh a favorite."""
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1)
+    palette = []
+    for i in range(size):
+        recipe = {key: round(rng.uniform(0, 10), 1) for key in DEFAULT_REGISTRY.order}
+        rgb = calculate_mixed_color(recipe)
+        palette.append({"id": str(uuid.uuid4()), "recipe": recipe, "rgb": rgb, "hex": rgb_to_hex(rgb),
+                        "favorite": i % 7 == 0, "timestamp": (start + timedelta(minutes=i)).isoformat()})
+    return palette
+
+
+@pytest.fixture
+def make_palette():
+    return _make_palette
@@ -0,0 +1,243 @@
+"""Exhaustive recipe-space sweep into a memory-mapped color atlas.
+
+Mixes every recipe on a grid_step grid over 0-10 % per pigment (101^4, about 10^8 recipes, for the
+built-in pigments at 0.1 %) and stores the colors in one flat file that other tools can map read-only:
+
+    python laasti_atlas.py sweep atlas.bin                # all cores; rerun to resume an interrupted sweep
+    python laasti_atlas.py sweep atlas.bin --workers 4 --grid-step 0.5
+    python laasti_atlas.py info atlas.bin
+
+    atlas = ColorAtlas(path)                               # zero-copy: atlas.colors is a read-only np.memmap
+    rgb = atlas.colors[atlas.index_of({"P.Y.42": 2.5})]
+
+File layout: a HEADER_BYTES header (ATLAS_MAGIC, a little-endian uint32 length and a JSON description
+of the grid and pigment model), then one uint8 (r, g, b) row per recipe, truncated like rgb_to_hex, in
+row-major order of the per-pigment levels (first pigment slowest), then one done flag byte per chunk.
+The recipe space is split into CHUNK_RECIPES-row chunks mixed on a process pool; each worker maps just
+its chunk's rows, writes and flushes them, and only then does the parent set the chunk's done flag, so
+a rerun after an interruption skips exactly the chunks that are on disk.
+"""
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+
+import numpy as np
+
+from laasti_core import (DEFAULT_REGISTRY, PIGMENT_CATALOG_ENV_VAR, calculate_mixed_colors_batch,
+                         load_pigment_registry)
+
+ATLAS_MAGIC = b"LAASTIATLAS\x00"
+ATLAS_FORMAT_VERSION = 1
+HEADER_BYTES = 4096  # Keeps the color rows page-aligned
+CHUNK_RECIPES = 1 << 18  # Recipes mixed per worker task (~25 MB of float64 scratch per worker)
+MAX_ATLAS_RECIPES = 1 << 32
+ATLAS_MAX_PERCENT = 10.0  # The slider range
+
+
+class AtlasFormatError(ValueError):
+    pass
+
+
+def atlas_header(registry, grid_step):
+    """The JSON header describing an atlas of registry's pigments at grid_step resolution."""
+    divisions = int(round(1.0 / grid_step))
+    if divisions < 1 or abs(divisions * grid_step - 1.0) > 1e-9:
+        raise ValueError(f"grid_step must be 1/n % for a whole n (0.1, 0.2, 0.5, 1, ...), got {grid_step}")
+    levels = int(round(ATLAS_MAX_PERCENT * divisions)) + 1
+    recipes = levels ** len(registry)
+    if recipes > MAX_ATLAS_RECIPES:
+        raise ValueError(f"{levels}^{len(registry)} = {recipes:,} recipes is too many for an atlas; "
+                         f"use a coarser grid_step")
+    chunks = -(-recipes // CHUNK_RECIPES)
+    return {"version": ATLAS_FORMAT_VERSION, "fingerprint": registry.fingerprint(), "order": registry.order,
+            "grid_step": grid_step, "divisions": divisions, "levels": levels, "recipes": recipes,
+            "chunk_recipes": CHUNK_RECIPES, "chunks": chunks, "data_offset": HEADER_BYTES,
+            "done_offset": HEADER_BYTES + recipes * 3}
+
+
+def read_atlas_header(path):
+    with open(path, 'rb') as f:
+        head = f.read(HEADER_BYTES)
+    if len(head) < len(ATLAS_MAGIC) + 4 or not head.startswith(ATLAS_MAGIC):
+        raise AtlasFormatError(f"{path} is not a color atlas")
+    (length,) = struct.unpack_from("<I", head, len(ATLAS_MAGIC))
+    try:
+        header = json.loads(head[len(ATLAS_MAGIC) + 4:len(ATLAS_MAGIC) + 4 + length].decode("utf-8"))
+    except ValueError as e:
+        raise AtlasFormatError(f"{path}: unreadable atlas header ({e})") from None
+    if header.get("version") != ATLAS_FORMAT_VERSION:
+        raise AtlasFormatError(f"{path}: unsupported atlas version {header.get('version')}")
+    if os.path.getsize(path) != header["done_offset"] + header["chunks"]:
+        raise AtlasFormatError(f"{path}: file size does not match its header (truncated?)")
+    return header
+
+
+def _create_atlas_file(path, header):
+    encoded = json.dumps(header, sort_keys=True).encode("utf-8")
+    if len(ATLAS_MAGIC) + 4 + len(encoded) > HEADER_BYTES:
+        raise ValueError("Atlas header does not fit in HEADER_BYTES")
+    tmp_path = Path(path).with_suffix(Path(path).suffix + ".part")
+    with open(tmp_path, 'wb') as f:
+        f.write(ATLAS_MAGIC + struct.pack("<I", len(encoded)) + encoded)
+        f.truncate(header["done_offset"] + header["chunks"])  # Sparse where the filesystem allows
+    os.replace(tmp_path, path)
+
+
+def mix_atlas_chunk(header, registry, chunk):
+    """The uint8 colors of one chunk's recipes, as an (n, 3) array."""
+    start = chunk * header["chunk_recipes"]
+    stop = min(start + header["chunk_recipes"], header["recipes"])
+    digits = np.unravel_index(np.arange(start, stop, dtype=np.int64), (header["levels"],) * len(registry))
+    percentages = np.stack(digits, axis=1) / header["divisions"]  # Same floats as the saved 0.1 % recipe values
+    return calculate_mixed_colors_batch(percentages, registry).astype(np.uint8)
+
+
+_worker = {}  # Per-process sweep state, set by _init_worker
+
+
+def _init_worker(path, header, registry):
+    _worker.update(path=path, header=header, registry=registry)
+
+
+def _sweep_chunk(chunk):
+    path, header = _worker["path"], _worker["header"]
+    colors = mix_atlas_chunk(header, _worker["registry"], chunk)
+    rows = np.memmap(path, dtype=np.uint8, mode='r+', shape=colors.shape,
+                     offset=header["data_offset"] + chunk * header["chunk_recipes"] * 3)
+    rows[:] = colors
+    rows.flush()
+    del rows
+    return chunk
+
+
+def sweep_atlas(path, registry=None, grid_step=0.1, workers=None, progress_callback=None):
+    """Mixes every chunk of the atlas at path that is not done yet, creating the file if needed.
+    progress_callback(chunks_done, chunks_total) is called after each finished chunk. Returns the
+    number of chunks mixed by this call (0 when the atlas was already complete)."""
+    registry = registry or DEFAULT_REGISTRY
+    header = atlas_header(registry, grid_step)
+    if Path(path).exists():
+        existing = read_atlas_header(path)
+        if existing != header:
+            raise AtlasFormatError(f"{path} holds an atlas of a different pigment model or grid; "
+                                   f"delete it or sweep into another file")
+    else:
+        _create_atlas_file(path, header)
+
+    done = np.memmap(path, dtype=np.uint8, mode='r+', offset=header["done_offset"], shape=(header["chunks"],))
+    todo = np.flatnonzero(done == 0).tolist()
+    finished = header["chunks"] - len(todo)
+    if progress_callback is not None:
+        progress_callback(finished, header["chunks"])
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(path), header, registry)) as pool:
+        futures = [pool.submit(_sweep_chunk, chunk) for chunk in todo]
+        try:
+            for future in as_completed(futures):
+                done[future.result()] = 1
+                done.flush()
+                finished += 1
+                if progress_callback is not None:
+                    progress_callback(finished, header["chunks"])
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    del done
+    return len(todo)
+
+
+class ColorAtlas:
+    """Read-only, zero-copy view of a swept atlas: `colors` is an (N, 3) uint8 np.memmap over the file,
+    indexed by recipe as in index_of/recipe_at."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.header = read_atlas_header(path)
+        self.order = self.header["order"]
+        self.levels, self.divisions = self.header["levels"], self.header["divisions"]
+        self.colors = np.memmap(path, dtype=np.uint8, mode='r', offset=self.header["data_offset"],
+                                shape=(self.header["recipes"], 3))
+        self.done = np.memmap(path, dtype=np.uint8, mode='r', offset=self.header["done_offset"],
+                              shape=(self.header["chunks"],))
+
+    def __len__(self):
+        return self.header["recipes"]
+
+    @property
+    def complete(self):
+        return bool(self.done.all())
+
+    def matches(self, registry):
+        return self.header["fingerprint"] == registry.fingerprint()
+
+    def index_of(self, recipe):
+        """Row of a recipe dict; values are snapped to the atlas grid."""
+        digits = [min(max(int(round(recipe.get(key, 0.0) * self.divisions)), 0), self.levels - 1)
+                  for key in self.order]
+        return int(np.ravel_multi_index(digits, (self.levels,) * len(self.order)))
+
+    def recipe_at(self, index):
+        digits = np.unravel_index(int(index), (self.levels,) * len(self.order))
+        return {key: int(d) / self.divisions for key, d in zip(self.order, digits)}
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Sweep the whole recipe space into a memory-mapped color atlas.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sweep = commands.add_parser("sweep", help="create the atlas, or resume an interrupted sweep")
+    sweep.add_argument("path")
+    sweep.add_argument("--catalog", help=f"pigment catalog JSON (default: ${PIGMENT_CATALOG_ENV_VAR} or built-in)")
+    sweep.add_argument("--grid-step", type=float, default=0.1, help="percent between grid levels (default: 0.1)")
+    sweep.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    info = commands.add_parser("info", help="show an atlas header and sweep progress")
+    info.add_argument("path")
+    return parser
+
+
+def main(argv=None, stderr=None):
+    args = build_arg_parser().parse_args(argv)
+    stderr = stderr or sys.stderr
+    if args.command == "info":
+        try:
+            atlas = ColorAtlas(args.path)
+        except (OSError, AtlasFormatError) as e:
+            print(f"laasti_atlas: {e}", file=stderr)
+            return 2
+        header = atlas.header
+        print(f"{args.path}: {header['recipes']:,} recipes, {header['levels']} levels of {header['grid_step']:g} % "
+              f"per pigment ({', '.join(atlas.order)})\n"
+              f"chunks done: {int(atlas.done.sum())}/{header['chunks']}")
+        return 0
+
+    try:
+        registry = load_pigment_registry(args.catalog)
+    except (OSError, ValueError) as e:
+        print(f"laasti_atlas: could not load pigment catalog: {e}", file=stderr)
+        return 2
+    start = time.perf_counter()
+
+    def report(done, total):
+        elapsed = time.perf_counter() - start
+        print(f"\r{done}/{total} chunks ({elapsed:,.0f} s)", end="", file=stderr, flush=True)
+
+    try:
+        mixed = sweep_atlas(args.path, registry, grid_step=args.grid_step, workers=args.workers,
+                            progress_callback=report)
+    except (OSError, ValueError) as e:
+        print(f"\nlaasti_atlas: {e}", file=stderr)
+        return 2
+    except KeyboardInterrupt:
+        print("\nInterrupted; run the same command again to resume.", file=stderr)
+        return 130
+    print(f"\nMixed {mixed} chunks in {time.perf_counter() - start:,.1f} s.", file=stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
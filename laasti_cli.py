@@ -0,0 +1,164 @@
+"""Batch color mixing from the command line.
+
+Reads recipes from stdin (CSV with one column per pigment key, or JSONL with one recipe object per
+line) and writes the mixed RGB/HEX per recipe to stdout. Input is processed in fixed-size batches,
+so memory stays constant however large the input file is.
+
+    python laasti_cli.py < recipes.csv > colors.csv
+    python laasti_cli.py --input-format jsonl --output-format jsonl < recipes.jsonl
+
+CSV input needs a header row; any of the pigment keys may appear as columns (missing ones
+count as 0 %), and an optional "id" column is passed through. Percentages accept a decimal comma
+and a trailing "%". JSONL lines are either a bare recipe ({"P.Y.42": 2.5, ...}) or an object with
+"recipe" and an optional "id", like the saved palette entries. Pigments come from --catalog (or
+$LAASTI_PIGMENT_CATALOG), defaulting to the built-in four.
+"""
+import time
+
+_IMPORT_START = time.perf_counter()
+
+import argparse
+import csv
+import json
+import sys
+
+import numpy as np
+
+from laasti_core import (PIGMENT_CATALOG_ENV_VAR, calculate_mixed_colors_batch, load_pigment_registry, parse_percentage,
+                         rgb_to_hex)
+
+_IMPORT_SECONDS = time.perf_counter() - _IMPORT_START
+
+DEFAULT_BATCH_SIZE = 4096
+OUTPUT_FIELDS = ["id", "r", "g", "b", "hex"]
+
+
+class RecipeInputError(ValueError):
+    def __init__(self, line_no, message):
+        super().__init__(f"line {line_no}: {message}")
+
+
+def iter_csv_recipes(stream, pigment_order):
+    """Iterator of (line_no, id, percentages) from a CSV stream with a header row. The header is read
+    and checked on the call itself, so a bad header fails before any output has been written."""
+    reader = csv.DictReader(stream)
+    unknown = [name for name in (reader.fieldnames or []) if name not in pigment_order and name != "id"]
+    if unknown:
+        raise RecipeInputError(1, f"unknown column(s) {', '.join(unknown)}; expected id and/or {pigment_order}")
+    return _iter_csv_rows(reader, pigment_order)
+
+
+def _iter_csv_rows(reader, pigment_order):
+    for row in reader:
+        try:
+            yield reader.line_num, row.get("id") or "", [parse_percentage(row.get(key)) for key in pigment_order]
+        except ValueError as e:
+            raise RecipeInputError(reader.line_num, e) from None
+
+
+def iter_jsonl_recipes(stream, pigment_order):
+    """Yields (line_no, id, percentages) from a JSON Lines stream, skipping blank lines."""
+    for line_no, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            obj = json.loads(line)
+            recipe = obj.get("recipe", obj) if isinstance(obj, dict) else None
+            if not isinstance(recipe, dict):
+                raise ValueError("expected a JSON object")
+            yield line_no, str(obj.get("id", "")), [parse_percentage(recipe.get(key)) for key in pigment_order]
+        except (ValueError, AttributeError) as e:
+            raise RecipeInputError(line_no, e) from None
+
+
+def iter_batches(recipes, batch_size):
+    ids, rows = [], []
+    for _, color_id, percentages in recipes:
+        ids.append(color_id)
+        rows.append(percentages)
+        if len(rows) >= batch_size:
+            yield ids, rows
+            ids, rows = [], []
+    if rows:
+        yield ids, rows
+
+
+def mix_stream(recipes, write_row, batch_size=DEFAULT_BATCH_SIZE, registry=None):
+    """Mixes recipes batch by batch, calling write_row(id, r, g, b, hex) per recipe. Returns the count."""
+    count = 0
+    for ids, rows in iter_batches(recipes, batch_size):
+        # Truncate like rgb_to_hex does, so the RGB columns always agree with the HEX column
+        mixed = calculate_mixed_colors_batch(np.array(rows, dtype=np.float64), registry).astype(np.int64).tolist()
+        for color_id, rgb in zip(ids, mixed):
+            write_row(color_id, rgb[0], rgb[1], rgb[2], rgb_to_hex(rgb))
+        count += len(ids)
+    return count
+
+
+def detect_input_format(stream):
+    """Peeks at the first non-blank character: '{' means JSONL, anything else CSV."""
+    head = stream.buffer.peek(64) if hasattr(stream, "buffer") and hasattr(stream.buffer, "peek") else b""
+    return "jsonl" if head.lstrip().startswith(b"{") else "csv"
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Mix pigment recipes from stdin into RGB/HEX rows on stdout.")
+    parser.add_argument("--input-format", choices=["auto", "csv", "jsonl"], default="auto",
+                        help="recipe input format (default: detect from the first character)")
+    parser.add_argument("--output-format", choices=["csv", "jsonl"], default="csv")
+    parser.add_argument("--catalog", help=f"pigment catalog JSON (default: ${PIGMENT_CATALOG_ENV_VAR} or built-in)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"recipes mixed per vectorized batch (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--timing", action="store_true",
+                        help="report import time, row count and throughput on stderr")
+    return parser
+
+
+def main(argv=None, stdin=None, stdout=None, stderr=None):
+    start = time.perf_counter()
+    args = build_arg_parser().parse_args(argv)
+    stdin, stdout, stderr = stdin or sys.stdin, stdout or sys.stdout, stderr or sys.stderr
+    if args.batch_size < 1:
+        print("--batch-size must be at least 1", file=stderr)
+        return 2
+
+    try:
+        registry = load_pigment_registry(args.catalog)
+    except (OSError, ValueError) as e:
+        print(f"laasti_cli: could not load pigment catalog: {e}", file=stderr)
+        return 2
+
+    input_format = detect_input_format(stdin) if args.input_format == "auto" else args.input_format
+    read_recipes = iter_jsonl_recipes if input_format == "jsonl" else iter_csv_recipes
+    try:
+        recipes = read_recipes(stdin, registry.order)
+    except RecipeInputError as e:
+        print(f"laasti_cli: {e}", file=stderr)
+        return 1
+    if args.output_format == "jsonl":
+        def write_row(color_id, r, g, b, hex_val):
+            stdout.write(json.dumps({"id": color_id, "r": r, "g": g, "b": b, "hex": hex_val}) + "\n")
+    else:
+        writer = csv.writer(stdout, lineterminator="\n")
+        writer.writerow(OUTPUT_FIELDS)
+
+        def write_row(color_id, r, g, b, hex_val):
+            writer.writerow((color_id, r, g, b, hex_val))
+
+    try:
+        count = mix_stream(recipes, write_row, batch_size=args.batch_size, registry=registry)
+    except RecipeInputError as e:
+        print(f"laasti_cli: {e}", file=stderr)
+        return 1
+    stdout.flush()
+
+    if args.timing:
+        elapsed = time.perf_counter() - start
+        rate = count / elapsed if elapsed > 0 else 0.0
+        print(f"import: {_IMPORT_SECONDS * 1000:.1f} ms, rows: {count}, mix: {elapsed * 1000:.1f} ms "
+              f"({rate:,.0f} rows/s)", file=stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
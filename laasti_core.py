@@ -0,0 +1,414 @@
+"""Headless pigment mixing model: pigment registry, color helpers, scalar and batch mixing (including
+the pigment pair fields of the gamut map), and the recipe match and duplicate indexes.
+
+Importable without tkinter or openpyxl, for scripts and batch jobs (see laasti_cli.py)."""
+import os
+import json
+import math
+import hashlib
+from pathlib import Path
+
+import numpy as np
+
+
+# --- Constants and Configuration ---
+PIGMENT_DATA = {
+    "P.Y.42": {"name_full": "Rautaoksidikeltainen kullankeltainen, P.Y.42", "rgb": (193, 153, 59), "intensity": 22.5},
+    "P.R.101": {"name_full": "Englanninpunainen, heleä 10A P.R.101", "rgb": (177, 66, 36), "intensity": 37.5},
+    "Caput Mortuum": {"name_full": "Caput Mortuum P.R.101", "rgb": (89, 45, 45), "intensity": 42.0},
+    "P.Bk.11": {"name_full": "Rautaoksidimusta P.Bk.11", "rgb": (58, 44, 38), "intensity": 45.0}
+}
+PIGMENT_ORDER = ["P.Y.42", "P.R.101", "Caput Mortuum", "P.Bk.11"]
+MORTAR_BASE_RGB = (255, 255, 255)
+D65_WHITE_XYZ = (0.95047, 1.0, 1.08883)
+PIGMENT_CATALOG_ENV_VAR = "LAASTI_PIGMENT_CATALOG"
+
+
+# --- Pigment Registry ---
+class PigmentRegistry:
+    """The pigments available for mixing, in mixing order, with their coefficients compiled once.
+
+    Both mixing paths read the compiled form: `coefficients` is a tuple of (key, intensity, r, g, b)
+    for the scalar path and `rgb`/`intensity` are contiguous (P, 3) and (P,) arrays for the batch
+    path, so mixing cost is linear in the pigment count with no per-call dict lookups.
+
+    A catalog file is JSON of the form
+        {"mortar_base_rgb": [255, 255, 255],                        (optional)
+         "pigments": [{"key": "P.Y.42", "name_full": "...", "rgb": [193, 153, 59], "intensity": 22.5}, ...]}
+    where the list order is the mixing (and slider / export column) order."""
+
+    def __init__(self, pigment_data, order=None, base_rgb=MORTAR_BASE_RGB):
+        self.order = list(order if order is not None else pigment_data)
+        if not self.order:
+            raise ValueError("A pigment registry needs at least one pigment")
+        if len(set(self.order)) != len(self.order):
+            raise ValueError("Pigment keys must be unique")
+        self.data = {}
+        for key in self.order:
+            entry = pigment_data[key]
+            rgb = tuple(entry["rgb"])
+            if not self._valid_rgb(rgb):
+                raise ValueError(f"Pigment {key}: rgb must be three values in 0-255, got {entry['rgb']}")
+            if not float(entry["intensity"]) > 0:
+                raise ValueError(f"Pigment {key}: intensity must be positive, got {entry['intensity']}")
+            self.data[key] = {"name_full": entry.get("name_full", key), "rgb": rgb,
+                              "intensity": float(entry["intensity"])}
+        if not isinstance(base_rgb, (list, tuple)) or not self._valid_rgb(tuple(base_rgb)):
+            raise ValueError(f"mortar_base_rgb must be three values in 0-255, got {base_rgb}")
+        self.base_rgb = tuple(base_rgb)
+        self.coefficients = tuple((key, self.data[key]["intensity"]) + self.data[key]["rgb"] for key in self.order)
+        self.rgb = np.array([self.data[key]["rgb"] for key in self.order], dtype=np.float64)
+        self.intensity = np.array([self.data[key]["intensity"] for key in self.order], dtype=np.float64)
+
+    def __len__(self):
+        return len(self.order)
+
+    @staticmethod
+    def _valid_rgb(rgb):
+        return (len(rgb) == 3 and all(isinstance(c, (int, float)) and not isinstance(c, bool) for c in rgb)
+                and all(0 <= c <= 255 for c in rgb))
+
+    @classmethod
+    def from_catalog(cls, catalog_path):
+        with open(catalog_path, 'r', encoding='utf-8') as f:
+            catalog = json.load(f)
+        try:
+            pigments = catalog["pigments"]
+            return cls({p["key"]: p for p in pigments}, [p["key"] for p in pigments],
+                       base_rgb=catalog.get("mortar_base_rgb", MORTAR_BASE_RGB))
+        except (KeyError, TypeError) as e:
+            raise ValueError(f"Malformed pigment catalog {catalog_path}: missing {e}") from None
+
+    def short_name(self, key):
+        return self.data[key]["name_full"].split(',')[0]
+
+    def fingerprint(self):
+        model = {"pigments": self.data, "order": self.order, "base": self.base_rgb}
+        return hashlib.sha256(json.dumps(model, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+DEFAULT_REGISTRY = PigmentRegistry(PIGMENT_DATA, PIGMENT_ORDER)
+
+
+def load_pigment_registry(catalog_path=None):
+    """Loads the registry from catalog_path, else from $LAASTI_PIGMENT_CATALOG, else the built-in pigments."""
+    catalog_path = catalog_path or os.environ.get(PIGMENT_CATALOG_ENV_VAR)
+    return PigmentRegistry.from_catalog(catalog_path) if catalog_path else DEFAULT_REGISTRY
+
+
+# --- Helper Functions ---
+def hex_to_rgb(hex_color):
+    hex_color = hex_color.strip().lstrip('#')
+    if len(hex_color) == 3:
+        hex_color = "".join(ch * 2 for ch in hex_color)
+    if len(hex_color) != 6:
+        raise ValueError(f"Not a HEX color: #{hex_color}")
+    return tuple(int(hex_color[i:i + 2], 16) for i in (0, 2, 4))
+
+
+def parse_color_string(text):
+    """Accepts '#RRGGBB', 'RRGGBB', '#RGB' or 'R, G, B' (also with 'rgb(...)' around it)."""
+    text = text.strip()
+    if text.lower().startswith("rgb"):
+        text = text[3:].strip().strip("()")
+    parts = [p for p in text.replace(";", ",").replace(" ", ",").split(",") if p]
+    if len(parts) == 3:
+        rgb = tuple(int(float(p)) for p in parts)
+        if not all(0 <= c <= 255 for c in rgb):
+            raise ValueError(f"RGB values must be 0-255: {text}")
+        return rgb
+    return hex_to_rgb(text)
+
+
+def parse_percentage(value):
+    """Reads a slider percentage from a number or text like "2,5 %" (empty or missing means 0)."""
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    value = value.strip().rstrip('%').strip().replace(',', '.')
+    return float(value) if value else 0.0
+
+
+def rgb_to_hex(rgb_tuple):
+    return f"#{int(rgb_tuple[0]):02x}{int(rgb_tuple[1]):02x}{int(rgb_tuple[2]):02x}"
+
+
+def hex_to_excel_rgb(hex_color):
+    hex_color = hex_color.lstrip('#')
+    return "FF" + hex_color.upper() if len(hex_color) == 6 else "FFFFFFFF"
+
+
+def calculate_mixed_color(pigment_percentages, registry=None):
+    registry = registry or DEFAULT_REGISTRY
+    r, g, b = registry.base_rgb
+    for key, intensity, pr, pg, pb in registry.coefficients:
+        if key in pigment_percentages and pigment_percentages[key] > 0:
+            alpha = min(pigment_percentages[key] / 100.0 * intensity, 1.0)
+            r = r * (1 - alpha) + pr * alpha
+            g = g * (1 - alpha) + pg * alpha
+            b = b * (1 - alpha) + pb * alpha
+    return (max(0, min(255, r)), max(0, min(255, g)), max(0, min(255, b)))
+
+
+def calculate_mixed_colors_batch(percentages_array, registry=None):
+    """Vectorized calculate_mixed_color for many recipes at once.
+
+    percentages_array is an (N, len(registry)) array of slider percentages, columns in
+    registry.order. Returns an (N, 3) float64 array of RGB values that matches
+    calculate_mixed_color row for row."""
+    registry = registry or DEFAULT_REGISTRY
+    percs = np.asarray(percentages_array, dtype=np.float64)
+    if percs.ndim == 1:
+        percs = percs.reshape(1, -1)
+    if percs.ndim != 2 or percs.shape[1] != len(registry):
+        raise ValueError(f"Expected an (N, {len(registry)}) array of percentages, got shape {percs.shape}")
+    # Same operation order as the scalar path; pigments at <= 0 % are skipped there, so alpha is 0 here.
+    alphas = np.where(percs > 0, np.minimum(percs / 100.0 * registry.intensity, 1.0), 0.0)
+    rgb = np.empty((percs.shape[0], 3), dtype=np.float64)
+    rgb[:] = registry.base_rgb
+    for i in range(len(registry)):
+        alpha = alphas[:, i:i + 1]
+        rgb = rgb * (1 - alpha) + registry.rgb[i] * alpha
+    return np.clip(rgb, 0, 255)
+
+
+def recipes_to_array(recipes, registry=None):
+    """Packs recipe dicts ({pigment_key: percentage}) into an (N, len(registry)) array."""
+    order = (registry or DEFAULT_REGISTRY).order
+    return np.array([[recipe.get(key, 0.0) for key in order] for recipe in recipes],
+                    dtype=np.float64).reshape(-1, len(order))
+
+
+def mix_pigment_pair_field(percentages, x_key, y_key, width, height, max_percent=10.0, registry=None):
+    """Mixes a width x height grid of recipes in one batch: x_key runs from 0 to max_percent left to
+    right, y_key from 0 to max_percent bottom to top, and every other pigment stays at its value in
+    percentages. Returns a (height, width, 3) uint8 image, truncated like rgb_to_hex."""
+    registry = registry or DEFAULT_REGISTRY
+    x_col, y_col = registry.order.index(x_key), registry.order.index(y_key)
+    percs = np.empty((height, width, len(registry)), dtype=np.float64)
+    percs[:] = [percentages.get(key, 0.0) for key in registry.order]
+    percs[:, :, x_col] = np.linspace(0.0, max_percent, width)[np.newaxis, :]
+    percs[:, :, y_col] = np.linspace(max_percent, 0.0, height)[:, np.newaxis]
+    rgb = calculate_mixed_colors_batch(percs.reshape(-1, len(registry)), registry)
+    return rgb.astype(np.uint8).reshape(height, width, 3)
+
+
+def rgb_array_to_lab(rgb_array):
+    """Converts an (N, 3) array of sRGB values (0-255) to CIELAB (D65)."""
+    srgb = np.asarray(rgb_array, dtype=np.float64).reshape(-1, 3) / 255.0
+    linear = np.where(srgb > 0.04045, ((srgb + 0.055) / 1.055) ** 2.4, srgb / 12.92)
+    xyz = linear @ np.array([[0.4124564, 0.2126729, 0.0193339],
+                             [0.3575761, 0.7151522, 0.1191920],
+                             [0.1804375, 0.0721750, 0.9503041]]) / np.array(D65_WHITE_XYZ)
+    f = np.where(xyz > (6 / 29) ** 3, np.cbrt(xyz), xyz / (3 * (6 / 29) ** 2) + 4 / 29)
+    return np.stack([116 * f[:, 1] - 16, 500 * (f[:, 0] - f[:, 1]), 200 * (f[:, 1] - f[:, 2])], axis=1)
+
+
+def rgb_to_lab(rgb_tuple):
+    return tuple(float(c) for c in rgb_array_to_lab([rgb_tuple])[0])
+
+
+class LabNeighborIndex:
+    """Incremental nearest-neighbor index of palette colors in CIELAB, for duplicate detection.
+
+    Colors are hashed into cubic CELL_SIZE cells keyed by their cell coordinates, so add and remove
+    are O(1) and a query only looks at the cells within the ΔE (CIE76) radius around the target.
+    Each cell's points are packed into an array on first query after a change, so cells crowded
+    with near-identical colors are still compared in one vectorized step."""
+    CELL_SIZE = 2.5
+
+    def __init__(self):
+        self._cells = {}  # (i, j, k) -> {color_id: lab}
+        self._cell_of = {}  # color_id -> (i, j, k)
+        self._packed = {}  # (i, j, k) -> (ids, (n, 3) array); dropped whenever the cell changes
+
+    def __len__(self):
+        return len(self._cell_of)
+
+    def _cell_key(self, lab):
+        return tuple(int(math.floor(c / self.CELL_SIZE)) for c in lab)
+
+    def add(self, color_id, lab):
+        self.remove(color_id)
+        key = self._cell_key(lab)
+        self._cells.setdefault(key, {})[color_id] = tuple(lab)
+        self._cell_of[color_id] = key
+        self._packed.pop(key, None)
+
+    def add_many(self, color_ids, rgb_array):
+        for color_id, lab in zip(color_ids, rgb_array_to_lab(rgb_array).tolist()):
+            self.add(color_id, lab)
+
+    def remove(self, color_id):
+        key = self._cell_of.pop(color_id, None)
+        if key is not None:
+            cell = self._cells[key]
+            del cell[color_id]
+            if not cell:
+                del self._cells[key]
+            self._packed.pop(key, None)
+
+    def _packed_cell(self, key):
+        packed = self._packed.get(key)
+        if packed is None:
+            cell = self._cells[key]
+            packed = self._packed[key] = (list(cell), np.array(list(cell.values()), dtype=np.float64))
+        return packed
+
+    def query(self, lab, max_delta_e, limit=5):
+        """Returns up to limit (delta_e, color_id) pairs within max_delta_e of lab, closest first."""
+        reach = int(math.ceil(max_delta_e / self.CELL_SIZE))
+        ci, cj, ck = self._cell_key(lab)
+        target = np.asarray(lab, dtype=np.float64)
+        hits = []  # (ids, distances, rows within max_delta_e) per cell
+        for i in range(ci - reach, ci + reach + 1):
+            for j in range(cj - reach, cj + reach + 1):
+                for k in range(ck - reach, ck + reach + 1):
+                    if (i, j, k) not in self._cells:
+                        continue
+                    ids, points = self._packed_cell((i, j, k))
+                    distances = np.sqrt(((points - target) ** 2).sum(axis=1))
+                    rows = np.flatnonzero(distances <= max_delta_e)
+                    if len(rows):
+                        hits.append((ids, distances, rows))
+        # Only the closest `limit` hits matter, however many near-identical colors are in range
+        best = sorted((float(distances[row]), ids[row]) for ids, distances, rows in hits
+                      for row in rows[np.argsort(distances[rows], kind="stable")[:limit]])
+        return best[:limit]
+
+
+class RecipeMatchIndex:
+    """Spatial index over a quantized recipe grid, for target color -> recipe lookups.
+
+    The grid covers 0-10 % per pigment in GRID_STEP increments (coarsened by doubling for large
+    registries until it fits MAX_GRID_POINTS), but stops each pigment at the level where its blend
+    alpha saturates at 1.0 (more pigment no longer changes the color).
+    Recipes are mixed once with calculate_mixed_colors_batch, near-identical colors are collapsed
+    onto the recipe using the least pigment, and the rest are bucketed into CELL_SIZE RGB cells.
+    Queries visit cells in order of their distance to the target and stop as soon as the k-th
+    hit is provably the k-th nearest."""
+    GRID_STEP = 0.1
+    MAX_PERCENT = 10.0
+    MAX_GRID_POINTS = 4_000_000
+    COLOR_RESOLUTION = 0.5  # Recipes closer than this in every channel count as the same color
+    CELL_SIZE = 4
+    CELLS_PER_AXIS = 256 // CELL_SIZE
+    FORMAT_VERSION = 2
+
+    def __init__(self, levels, colors, fingerprint, registry=None, grid_step=GRID_STEP):
+        cell_ids = self._cell_ids(colors)
+        order = np.argsort(cell_ids, kind="stable")
+        self.levels = levels[order]
+        self.colors = colors[order]
+        self.fingerprint = fingerprint
+        self.registry = registry or DEFAULT_REGISTRY
+        self.grid_step = float(grid_step)
+        # Only non-empty cells are kept: their box corners and the [start, end) slice of their points
+        self.cell_ids, self.cell_starts = np.unique(cell_ids[order], return_index=True)
+        self.cell_ends = np.append(self.cell_starts[1:], len(order))
+        per_axis = self.CELLS_PER_AXIS
+        self.cell_lows = np.stack([self.cell_ids // (per_axis * per_axis), (self.cell_ids // per_axis) % per_axis,
+                                   self.cell_ids % per_axis], axis=1).astype(np.float32) * self.CELL_SIZE
+        self.cell_highs = self.cell_lows + self.CELL_SIZE
+
+    @classmethod
+    def fingerprint_for_model(cls, registry=None):
+        model = {"pigments": (registry or DEFAULT_REGISTRY).fingerprint(), "step": cls.GRID_STEP,
+                 "max": cls.MAX_PERCENT, "max_points": cls.MAX_GRID_POINTS, "resolution": cls.COLOR_RESOLUTION,
+                 "cell": cls.CELL_SIZE, "version": cls.FORMAT_VERSION}
+        return hashlib.sha256(json.dumps(model, sort_keys=True).encode("utf-8")).hexdigest()
+
+    @classmethod
+    def grid_levels(cls, registry, grid_step):
+        """Number of grid_step levels per pigment, capped where the pigment saturates."""
+        max_level = int(round(cls.MAX_PERCENT / grid_step))
+        return [min(max_level, int(np.ceil(100.0 / (intensity * grid_step)))) for intensity in registry.intensity]
+
+    @classmethod
+    def grid_step_for(cls, registry):
+        grid_step = cls.GRID_STEP
+        while np.prod([n + 1 for n in cls.grid_levels(registry, grid_step)], dtype=np.float64) > cls.MAX_GRID_POINTS:
+            grid_step *= 2
+        return grid_step
+
+    @classmethod
+    def build(cls, registry=None):
+        registry = registry or DEFAULT_REGISTRY
+        grid_step = cls.grid_step_for(registry)
+        grids = np.meshgrid(*[np.arange(n + 1, dtype=np.uint8) for n in cls.grid_levels(registry, grid_step)],
+                            indexing="ij")
+        levels = np.stack([g.ravel() for g in grids], axis=1)
+        colors = calculate_mixed_colors_batch(levels * grid_step, registry)
+        # Collapse recipes that land on the same color, keeping the one with the least pigment
+        color_keys = np.round(colors / cls.COLOR_RESOLUTION).astype(np.int64)
+        order = np.lexsort((levels.sum(axis=1, dtype=np.int64), color_keys[:, 2], color_keys[:, 1], color_keys[:, 0]))
+        sorted_keys = color_keys[order]
+        first = np.ones(len(order), dtype=bool)
+        first[1:] = (sorted_keys[1:] != sorted_keys[:-1]).any(axis=1)
+        keep = order[first]
+        return cls(levels[keep], colors[keep].astype(np.float32), cls.fingerprint_for_model(registry), registry,
+                   grid_step)
+
+    @classmethod
+    def load_or_build(cls, cache_path, registry=None):
+        """Loads the cached index from cache_path, rebuilding it when the pigment model changed."""
+        fingerprint = cls.fingerprint_for_model(registry)
+        try:
+            with np.load(cache_path) as cached:
+                if str(cached["fingerprint"]) == fingerprint:
+                    return cls(cached["levels"], cached["colors"], fingerprint, registry, float(cached["grid_step"]))
+        except (OSError, KeyError, ValueError):
+            pass  # Missing or unreadable cache: rebuild below
+        index = cls.build(registry)
+        try:
+            index.save(cache_path)
+        except OSError:
+            pass  # The index still works from memory, it just gets rebuilt next time
+        return index
+
+    def save(self, cache_path):
+        tmp_path = Path(cache_path).with_suffix(".tmp.npz")
+        np.savez(tmp_path, levels=self.levels, colors=self.colors, fingerprint=np.array(self.fingerprint),
+                 grid_step=np.array(self.grid_step))
+        os.replace(tmp_path, cache_path)
+
+    def _cell_ids(self, colors):
+        cells = np.clip(np.asarray(colors) // self.CELL_SIZE, 0, self.CELLS_PER_AXIS - 1).astype(np.int64)
+        return (cells[..., 0] * self.CELLS_PER_AXIS + cells[..., 1]) * self.CELLS_PER_AXIS + cells[..., 2]
+
+    def _points_in_cells(self, cells):
+        starts, lengths = self.cell_starts[cells], self.cell_ends[cells] - self.cell_starts[cells]
+        # Expand the [start, end) runs into one flat index array without a Python loop
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return offsets + np.arange(int(lengths.sum()))
+
+    def query(self, target_rgb, k=5):
+        """Returns up to k (distance, recipe, rgb) tuples nearest to target_rgb, closest first."""
+        target = np.asarray(target_rgb, dtype=np.float32)
+        k = min(k, len(self.colors))
+        if k <= 0:
+            return []
+        # Visit cells nearest-box-first; stop once no unvisited cell can hold anything closer
+        gap = np.maximum(np.maximum(self.cell_lows - target, target - self.cell_highs), 0)
+        lower_bounds = np.sqrt((gap * gap).sum(axis=1))
+        cell_order = np.argsort(lower_bounds)
+        best_dist, best_rows = np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+        pos, batch = 0, 8
+        while pos < len(cell_order):
+            rows = self._points_in_cells(cell_order[pos:pos + batch])
+            pos, batch = pos + batch, batch * 2
+            distances = np.sqrt(((self.colors[rows] - target) ** 2).sum(axis=1))
+            best_dist, best_rows = np.concatenate([best_dist, distances]), np.concatenate([best_rows, rows])
+            if len(best_dist) > k:
+                keep = np.argpartition(best_dist, k - 1)[:k]
+                best_dist, best_rows = best_dist[keep], best_rows[keep]
+            if len(best_dist) == k and (pos >= len(cell_order) or best_dist.max() <= lower_bounds[cell_order[pos]]):
+                break
+        ranked = np.argsort(best_dist, kind="stable")
+        return [(float(best_dist[i]), self.recipe_for(best_rows[i]),
+                 tuple(float(c) for c in self.colors[best_rows[i]])) for i in ranked]
+
+    def recipe_for(self, row):
+        return {key: round(float(level) * self.grid_step, 1)
+                for key, level in zip(self.registry.order, self.levels[row])}
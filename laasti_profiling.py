@@ -0,0 +1,148 @@
+"""Opt-in timing of the mixer's hot paths.
+
+Enabled with $LAASTI_PROFILE (a report path, or 1 for PROFILE_REPORT_FILE_NAME in the working
+directory) or `python laastigithub.py --profile [REPORT]`, optionally with a cProfile dump via
+$LAASTI_CPROFILE / --cprofile PATH. Instrumented methods are wrapped on their class before the app is
+created; when profiling is off nothing is wrapped, so the disabled cost is one environment lookup at
+startup. The JSON report holds per-method call counts, total/mean/max latency and a latency histogram
+(HISTOGRAM_BOUNDS_MS buckets, percentiles read off it), plus the last and peak value of each gauge.
+"""
+import bisect
+import cProfile
+import functools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+PROFILE_ENV_VAR = "LAASTI_PROFILE"
+CPROFILE_ENV_VAR = "LAASTI_CPROFILE"
+PROFILE_REPORT_FILE_NAME = "laasti_profile.json"
+HISTOGRAM_BOUNDS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8, 16, 33, 66, 125, 250, 500, 1000, 2500, 5000)
+
+
+class LatencyStats:
+    """Call count, total/max and a fixed-bucket histogram of one instrumented callable."""
+
+    def __init__(self):
+        self.calls = 0
+        self.total_s = 0.0
+        self.max_s = 0.0
+        self.buckets = [0] * (len(HISTOGRAM_BOUNDS_MS) + 1)  # The last bucket counts everything slower
+
+    def record(self, seconds):
+        self.calls += 1
+        self.total_s += seconds
+        self.max_s = max(self.max_s, seconds)
+        self.buckets[bisect.bisect_left(HISTOGRAM_BOUNDS_MS, seconds * 1000.0)] += 1
+
+    def percentile_ms(self, q):
+        """Upper bound of the bucket holding the q-th quantile (the max for the overflow bucket)."""
+        rank, seen = q * self.calls, 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return HISTOGRAM_BOUNDS_MS[i] if i < len(HISTOGRAM_BOUNDS_MS) else self.max_s * 1000.0
+        return 0.0
+
+    def as_dict(self):
+        labels = [f"<={bound:g}ms" for bound in HISTOGRAM_BOUNDS_MS] + [f">{HISTOGRAM_BOUNDS_MS[-1]:g}ms"]
+        return {"calls": self.calls, "total_ms": self.total_s * 1000.0,
+                "mean_ms": self.total_s * 1000.0 / self.calls if self.calls else 0.0, "max_ms": self.max_s * 1000.0,
+                "p50_ms": self.percentile_ms(0.5), "p95_ms": self.percentile_ms(0.95),
+                "p99_ms": self.percentile_ms(0.99),
+                "histogram": {label: count for label, count in zip(labels, self.buckets) if count}}
+
+
+class Instrumentation:
+    """Collects latencies of wrapped callables and samples of named gauges, and writes the report."""
+
+    def __init__(self, report_path, cprofile_path=None):
+        self.report_path = Path(report_path)
+        self.cprofile_path = Path(cprofile_path) if cprofile_path else None
+        self.stats = {}  # name -> LatencyStats
+        self.gauges = {}  # name -> (sample function, {"last", "max", "samples"})
+        self._lock = threading.Lock()  # Some instrumented calls run on worker threads
+        self._started = time.perf_counter()
+        self._started_at = datetime.now().isoformat()
+        self._finished = False
+        self.profiler = None
+        if self.cprofile_path is not None:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+
+    @classmethod
+    def from_settings(cls, report_path=None, cprofile_path=None):
+        """Returns an Instrumentation when profiling was requested (arguments first, then the
+        environment), else None."""
+        report_path = report_path or os.environ.get(PROFILE_ENV_VAR)
+        cprofile_path = cprofile_path or os.environ.get(CPROFILE_ENV_VAR)
+        if not report_path and not cprofile_path:
+            return None
+        if not report_path or report_path.strip().lower() in ("1", "true", "yes", "on"):
+            report_path = PROFILE_REPORT_FILE_NAME
+        return cls(report_path, cprofile_path)
+
+    def _timed(self, name, func):
+        stats = self.stats.setdefault(name, LatencyStats())
+        lock = self._lock
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with lock:
+                    stats.record(elapsed)
+        wrapper.__wrapped_by_instrumentation__ = True
+        return wrapper
+
+    def instrument_class(self, cls, method_names):
+        """Replaces each named method of cls with a timed wrapper, recorded as "Class.method"."""
+        for name in method_names:
+            method = getattr(cls, name)
+            if not getattr(method, "__wrapped_by_instrumentation__", False):
+                setattr(cls, name, self._timed(f"{cls.__name__}.{name}", method))
+
+    def instrument_function(self, module, name):
+        """Replaces module.name with a timed wrapper. Rebinds only that module's reference."""
+        func = getattr(module, name)
+        if not getattr(func, "__wrapped_by_instrumentation__", False):
+            setattr(module, name, self._timed(name, func))
+
+    def add_gauge(self, name, sample):
+        self.gauges[name] = (sample, {"last": None, "max": None, "samples": 0})
+
+    def sample_gauges(self):
+        for sample, values in self.gauges.values():
+            value = sample()
+            values["last"] = value
+            values["max"] = value if values["max"] is None else max(values["max"], value)
+            values["samples"] += 1
+
+    def report(self):
+        with self._lock:
+            calls = {name: stats.as_dict() for name, stats in sorted(self.stats.items())}
+        return {"started": self._started_at, "wall_s": time.perf_counter() - self._started, "calls": calls,
+                "gauges": {name: dict(values) for name, (_, values) in sorted(self.gauges.items())}}
+
+    def finish(self):
+        """Samples the gauges a last time and writes the report (and the cProfile stats). Safe to
+        call more than once; only the first call writes. Returns the report path."""
+        if self._finished:
+            return self.report_path
+        self._finished = True
+        if self.profiler is not None:
+            self.profiler.disable()
+            self.profiler.dump_stats(str(self.cprofile_path))
+        try:
+            self.sample_gauges()
+        except Exception:
+            pass  # The widgets behind a gauge may already be destroyed at exit
+        with open(self.report_path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2)
+        return self.report_path
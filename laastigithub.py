@@ -1,13 +1,28 @@
 import tkinter as tk
-from tkinter import ttk, messagebox, font
+from tkinter import ttk, messagebox, font, simpledialog, filedialog
 from datetime import datetime
+import argparse
+import math
 import os
-import openpyxl
-from openpyxl.styles import PatternFill, Font, Alignment  # For cell coloring and formatting
+import queue
+import sys
+import threading
 from pathlib import Path
-import json
+from collections import OrderedDict
+import bisect
 import uuid  # For unique IDs for saved colors
 
+import numpy as np
+
+from laasti_core import (DEFAULT_REGISTRY, PIGMENT_CATALOG_ENV_VAR, LabNeighborIndex, RecipeMatchIndex,
+                         calculate_mixed_color, load_pigment_registry, mix_pigment_pair_field, parse_color_string,
+                         parse_percentage, rgb_to_hex, rgb_to_lab)
+from laasti_profiling import CPROFILE_ENV_VAR, PROFILE_ENV_VAR, Instrumentation
+from palette_export import write_palette_xlsx
+from palette_import import IMPORT_FORMATS, read_palette_import
+from palette_search import FilterSyntaxError, PaletteFilter, PaletteSearchIndex
+from palette_store import PaletteStore, PaletteWriter
+
 
 # --- Helper Class for Tooltips ---
 class ToolTip:
@@ -37,15 +52,78 @@ class ToolTip:
         self.tooltip_window = None
 
 
+# --- Helper Class for Palette Rows ---
+class PaletteRow:
+    """One pooled row of the saved palette view. Rows are rebound to whichever entry scrolls into
+    their slot; widgets are only reconfigured when the bound entry's visible state changes."""
+
+    def __init__(self, app, parent):
+        self.color_id = None
+        self.recipe = None
+        self.rendered_state = None  # (id, hex, favorite) last drawn into the widgets
+        self.frame = ttk.Frame(parent, padding=3, relief=tk.SOLID, borderwidth=1)
+        self.swatch = tk.Canvas(self.frame, width=40, height=25, highlightthickness=1,
+                                highlightbackground=COLOR_PALETTE["swatch_border"])
+        self.swatch.pack(side=tk.LEFT, padx=(0, 5))
+        self.swatch.bind("<Button-1>", lambda e: self.recipe is not None and app.apply_saved_color_recipe(self.recipe))
+        self.swatch_tooltip = ToolTip(self.swatch, "")
+        self.fav_btn = tk.Button(self.frame, relief=tk.FLAT, font=('Helvetica', 11, 'bold'),
+                                 command=lambda: self.color_id is not None and app.toggle_favorite_color(self.color_id))
+        self.fav_btn.pack(side=tk.LEFT, padx=3)
+        ToolTip(self.fav_btn, "Toggle Favorite")
+        self.del_btn = ttk.Button(self.frame, text="Del", style="Small.TButton",
+                                  command=lambda: self.color_id is not None and app.delete_saved_color(self.color_id))
+        self.del_btn.pack(side=tk.RIGHT, padx=3)
+        ToolTip(self.del_btn, "Delete color")
+
+    def bind_entry(self, color_data):
+        state = (color_data['id'], color_data['hex'], color_data.get('favorite', False))
+        self.color_id, self.recipe = color_data['id'], color_data['recipe']
+        if state == self.rendered_state:
+            return False
+        self.rendered_state = state
+        self.swatch.config(bg=state[1])
+        self.swatch_tooltip.text = f"Apply: {self.recipe}"
+        star_char, star_color = ("★", COLOR_PALETTE["star_favorite"]) if state[2] else (
+            "☆", COLOR_PALETTE["text_secondary"])
+        self.fav_btn.config(text=star_char, fg=star_color)
+        return True
+
+
+# --- Helper for Bulk Image Updates ---
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def photo_image_rows(rgb_image):
+    """Formats a (height, width, 3) uint8 image as the row list PhotoImage.put takes
+    ("{#rrggbb #rrggbb ...} {...} ..."), built as one byte array so a whole image is a single put call."""
+    height, width, _ = rgb_image.shape
+    chars = np.empty((height, width * 8 + 3), dtype=np.uint8)
+    pixels = chars[:, 1:-2].reshape(height, width, 8)
+    pixels[:, :, 0] = ord('#')
+    pixels[:, :, 1:7:2] = _HEX_DIGITS[rgb_image >> 4]
+    pixels[:, :, 2:7:2] = _HEX_DIGITS[rgb_image & 0x0F]
+    pixels[:, :, 7] = ord(' ')
+    chars[:, 0], chars[:, -2], chars[:, -1] = ord('{'), ord('}'), ord(' ')
+    return chars.tobytes().decode('ascii')
+
+
 # --- Constants and Configuration ---
-PIGMENT_DATA = {
-    "P.Y.42": {"name_full": "Rautaoksidikeltainen kullankeltainen, P.Y.42", "rgb": (193, 153, 59), "intensity": 22.5},
-    "P.R.101": {"name_full": "Englanninpunainen, heleä 10A P.R.101", "rgb": (177, 66, 36), "intensity": 37.5},
-    "Caput Mortuum": {"name_full": "Caput Mortuum P.R.101", "rgb": (89, 45, 45), "intensity": 42.0},
-    "P.Bk.11": {"name_full": "Rautaoksidimusta P.Bk.11", "rgb": (58, 44, 38), "intensity": 45.0}
-}
-PIGMENT_ORDER = ["P.Y.42", "P.R.101", "Caput Mortuum", "P.Bk.11"]
-MORTAR_BASE_RGB = (255, 255, 255)
+PALETTE_ROW_HEIGHT = 38  # Fixed row pitch of the virtualized saved palette view, in pixels
+PALETTE_PAGE_SIZE = 500  # Saved colors (or filter results) per page of the palette view
+PREVIEW_FRAME_MS = 16  # Slider changes are coalesced into at most one preview redraw per ~60 Hz frame
+WRITER_POLL_MS = 250  # How often the UI checks the background palette writer for errors
+WRITER_CLOSE_TIMEOUT_S = 10  # How long closing the window waits for pending palette writes
+JOB_CLOSE_TIMEOUT_S = 10  # How long closing the window waits for a cancelled export/import to wind down
+GAMUT_MAP_SIZE = 320  # Pixels per side of the gamut map, i.e. ~100k recipes mixed per field
+GAMUT_MAP_MAX_PERCENT = 10.0  # Axis range of the gamut map, the same as the sliders
+GAMUT_MAP_CACHE_SIZE = 16  # Rendered gamut map images kept for reuse; the least recently shown is evicted first
+PROFILE_SAMPLE_MS = 1000  # How often gauges (widget counts) are sampled while profiling
+PROFILED_METHODS = ("_on_slider_change", "update_color_preview", "populate_saved_colors_display",
+                    "save_colors_to_file", "load_saved_colors", "export_palette_to_excel",
+                    "_finish_import")
+DUPLICATE_DELTA_E = 2.3  # Saved colors closer than this (CIE76 ΔE, ~1 just-noticeable difference) count as duplicates
+DUPLICATE_DELTA_E_ENV_VAR = "LAASTI_DUPLICATE_DELTA_E"  # Overrides DUPLICATE_DELTA_E; 0 turns the check off
 
 # --- GitHub Friendly Save/Export Directory ---
 # Attempt to use a subfolder in the user's Downloads directory
@@ -56,7 +134,10 @@ try:
 except Exception:  # Fallback if Path.home() or Downloads isn't resolvable (rare)
     DEFAULT_SAVE_DIR = Path(".") / APP_DATA_SUBFOLDER_NAME
 
-SAVED_COLORS_FILE_NAME = "saved_pigment_colors.json"
+SAVED_COLORS_FILE_NAME = "saved_pigment_colors.json"  # Legacy store, migrated into PALETTE_DB_FILE_NAME once
+PALETTE_DB_FILE_NAME = "saved_pigment_colors.sqlite3"
+MATCH_INDEX_FILE_NAME = "recipe_match_index.npz"
+PIGMENT_CATALOG_FILE_NAME = "pigment_catalog.json"  # Optional; overrides the built-in pigments (see PigmentRegistry)
 
 COLOR_PALETTE = {
     "window_bg": "#ECEFF1", "frame_bg": "#FFFFFF", "text_primary": "#263238",
@@ -66,30 +147,8 @@ COLOR_PALETTE = {
 }
 
 
-# --- Helper Functions ---
-def rgb_to_hex(rgb_tuple):
-    return f"#{int(rgb_tuple[0]):02x}{int(rgb_tuple[1]):02x}{int(rgb_tuple[2]):02x}"
-
-
-def hex_to_excel_rgb(hex_color):
-    hex_color = hex_color.lstrip('#')
-    return "FF" + hex_color.upper() if len(hex_color) == 6 else "FFFFFFFF"
-
-
-def calculate_mixed_color(pigment_percentages):
-    r, g, b = MORTAR_BASE_RGB
-    for key in PIGMENT_ORDER:
-        if key in pigment_percentages and pigment_percentages[key] > 0:
-            data, perc_frac = PIGMENT_DATA[key], pigment_percentages[key] / 100.0
-            alpha = min(perc_frac * data["intensity"], 1.0)
-            r = r * (1 - alpha) + data["rgb"][0] * alpha
-            g = g * (1 - alpha) + data["rgb"][1] * alpha
-            b = b * (1 - alpha) + data["rgb"][2] * alpha
-    return (max(0, min(255, r)), max(0, min(255, g)), max(0, min(255, b)))
-
-
 class PigmentMixerApp:
-    def __init__(self, root):
+    def __init__(self, root, duplicate_delta_e=None):
         self.root = root
         self.root.title("Weber AK Pigment Mixer (Custom Palette)")
         self.root.configure(bg=COLOR_PALETTE["window_bg"])
@@ -115,13 +174,40 @@ class PigmentMixerApp:
         self.label_font = font.Font(family="Helvetica", size=9)
         self.small_font = font.Font(family="Helvetica", size=8)
 
-        self.pigment_vars = {key: tk.DoubleVar(value=0.0) for key in PIGMENT_ORDER}
-        self.pigment_labels = {key: tk.StringVar(value="0,0 %") for key in PIGMENT_ORDER}
+        self._pending_slider_keys = set()
+        self._slider_flush_id = None  # after() id of the scheduled frame flush, if any
+        self._last_preview_hex = None
+        self.redraw_stats = {"performed": 0, "skipped_coalesced": 0, "skipped_unchanged": 0}
 
-        self.saved_colors = []
-        # json_save_path will be determined by _ensure_save_dir_exists and used in load/save
+        self.saved_colors = {}  # id -> entry, in the store's display order as loaded
+        # Display order of the palette view, kept sorted incrementally: parallel lists of sort keys and ids
+        self._palette_keys, self._palette_ids = [], []
+        self._palette_rows = []  # Pool of PaletteRow widgets, only enough to fill the visible area
+        self._palette_top = 0  # Scroll offset of the virtual palette list within the page, in pixels
+        self.palette_filter = PaletteFilter()  # Active filter of the palette view (empty: show everything)
+        self._view_ids = []  # Ids passing the filter, in display order; paged by _palette_page
+        self._palette_page = 0
+        self.search_index = None  # PaletteSearchIndex of the saved colors, built by load_saved_colors
+        self.duplicate_index = LabNeighborIndex()  # CIELAB index of the saved colors, kept in step with saved_colors
+        self.duplicate_delta_e = self._load_duplicate_delta_e(duplicate_delta_e)
+        # json_save_path/palette_db_path will be determined by _ensure_save_dir_exists and used in load/save
         self.current_save_dir = self._ensure_save_dir_exists()  # Determine actual save dir on init
+        self.registry = self._load_pigment_registry()
+        self.pigment_vars = {key: tk.DoubleVar(value=0.0) for key in self.registry.order}
+        self.pigment_labels = {key: tk.StringVar(value="0,0 %") for key in self.registry.order}
         self.json_save_path = self.current_save_dir / SAVED_COLORS_FILE_NAME
+        self.palette_db_path = self.current_save_dir / PALETTE_DB_FILE_NAME
+        self.palette_writer = None  # Write-behind thread that persists palette changes
+        self._writer_errors = queue.Queue()  # Exceptions from the writer thread, shown by _poll_writer_status
+        self._writer_error_shown = False
+        self.match_index_path = self.current_save_dir / MATCH_INDEX_FILE_NAME
+        self.match_index = None  # Built or loaded on first "Match Color" use
+        self._jobs = {}  # Running background jobs ("export", "import") by name; see _start_background_job
+        self._palette_version = 0  # Bumped on every palette edit, so an import can tell its merge went stale
+        self.gamut_window = None  # The gamut map panel, while open
+        # Rendered gamut map images by (x key, y key, fixed slider values), least recently shown first
+        self._gamut_images = OrderedDict()
+        self._gamut_state = None  # Key of the image currently shown
         self.load_saved_colors()
 
         main_content_frame = ttk.Frame(root, padding=(8, 10), style="TFrame")
@@ -131,7 +217,7 @@ class PigmentMixerApp:
         preview_frame_outer.pack(pady=(0, 8), padx=3, fill=tk.X)
         ttk.Label(preview_frame_outer, text="Color Preview", font=self.header_font, anchor='center').pack(pady=(0, 3),
                                                                                                           fill=tk.X)
-        self.color_preview = tk.Canvas(preview_frame_outer, width=250, height=180, bg=rgb_to_hex(MORTAR_BASE_RGB),
+        self.color_preview = tk.Canvas(preview_frame_outer, width=250, height=180, bg=rgb_to_hex(self.registry.base_rgb),
                                        highlightthickness=1, highlightbackground=COLOR_PALETTE["accent"])
         self.color_preview.pack(expand=True, fill=tk.X, pady=(0, 3))
         self.rgb_hex_label = ttk.Label(preview_frame_outer, text="RGB: (...)\nHEX: #...", font=self.small_font,
@@ -144,8 +230,8 @@ class PigmentMixerApp:
                                                                                                  columnspan=3,
                                                                                                  pady=(0, 8),
                                                                                                  sticky='w')
-        for i, key in enumerate(PIGMENT_ORDER):
-            label_text = PIGMENT_DATA[key]['name_full'].split(',')[0]
+        for i, key in enumerate(self.registry.order):
+            label_text = self.registry.short_name(key)
             ttk.Label(sliders_frame, text=label_text, font=self.label_font, wraplength=170).grid(row=i + 1, column=0,
                                                                                                  sticky='w', padx=3,
                                                                                                  pady=3)
@@ -158,56 +244,158 @@ class PigmentMixerApp:
         sliders_frame.columnconfigure(1, weight=2);
         sliders_frame.columnconfigure(2, weight=0)
 
+        self.status_label = ttk.Label(main_content_frame, text="", font=self.small_font,
+                                      foreground=COLOR_PALETTE["text_secondary"])
+        self.status_label.pack(fill=tk.X, padx=3, side=tk.BOTTOM)
         actions_frame = ttk.Frame(main_content_frame, style="TFrame", padding=(0, 3))
         actions_frame.pack(fill=tk.X, pady=(5, 8), padx=3, side=tk.BOTTOM)
         save_button = ttk.Button(actions_frame, text="Save Current Color", command=self.save_current_color_action,
                                  style="Accent.TButton")
         save_button.pack(side=tk.LEFT, padx=(0, 5), expand=True, fill=tk.X)
+        match_button = ttk.Button(actions_frame, text="Match Color...", command=self.match_color_action,
+                                  style="Accent.TButton")
+        match_button.pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
+        gamut_button = ttk.Button(actions_frame, text="Gamut Map...", command=self.open_gamut_map,
+                                  style="Accent.TButton")
+        gamut_button.pack(side=tk.LEFT, padx=5, expand=True, fill=tk.X)
         export_button = ttk.Button(actions_frame, text="Export Palette to Excel", command=self.export_palette_to_excel,
                                    style="Accent.TButton")
         export_button.pack(side=tk.LEFT, padx=(5, 0), expand=True, fill=tk.X)
 
         saved_colors_outer_frame = ttk.LabelFrame(main_content_frame, text="Saved Color Palette", padding=(8, 5))
         saved_colors_outer_frame.pack(pady=8, padx=3, fill=tk.BOTH, expand=True)
-        self.saved_colors_canvas = tk.Canvas(saved_colors_outer_frame, borderwidth=0,
+        filter_bar = ttk.Frame(saved_colors_outer_frame, style="TFrame")
+        filter_bar.pack(side=tk.TOP, fill=tk.X, pady=(0, 4))
+        ttk.Label(filter_bar, text="Filter:", font=self.label_font).pack(side=tk.LEFT)
+        self.filter_var = tk.StringVar()
+        filter_entry = ttk.Entry(filter_bar, textvariable=self.filter_var, width=36)
+        filter_entry.pack(side=tk.LEFT, padx=3, fill=tk.X, expand=True)
+        ToolTip(filter_entry, "e.g. #b08d   P.Bk.11 > 2%   Caput Mortuum 1-3%   fav   2024-01..2024-03")
+        self.filter_var.trace_add("write", lambda *args: self._on_filter_change())
+        self.filter_status_label = ttk.Label(filter_bar, text="", font=self.small_font)
+        self.filter_status_label.pack(side=tk.LEFT, padx=(3, 0))
+        import_button = ttk.Button(filter_bar, text="Import...", style="Small.TButton",
+                                   command=self.import_palette_action)
+        import_button.pack(side=tk.RIGHT, padx=(3, 0))
+        ToolTip(import_button, "Add colors from a palette export (.xlsx), a CSV with pigment % columns or JSON")
+        page_bar = ttk.Frame(saved_colors_outer_frame, style="TFrame")
+        page_bar.pack(side=tk.BOTTOM, fill=tk.X, pady=(4, 0))
+        self.prev_page_button = ttk.Button(page_bar, text="◀", width=3, style="Small.TButton",
+                                           command=lambda: self._change_palette_page(-1))
+        self.prev_page_button.pack(side=tk.LEFT)
+        self.page_label = ttk.Label(page_bar, text="", font=self.small_font, anchor='center')
+        self.page_label.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.next_page_button = ttk.Button(page_bar, text="▶", width=3, style="Small.TButton",
+                                           command=lambda: self._change_palette_page(1))
+        self.next_page_button.pack(side=tk.RIGHT)
+        self.saved_colors_canvas = tk.Canvas(saved_colors_outer_frame, borderwidth=0, highlightthickness=0,
                                              background=COLOR_PALETTE["frame_bg"])
         self.saved_colors_canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar = ttk.Scrollbar(saved_colors_outer_frame, orient=tk.VERTICAL, command=self.saved_colors_canvas.yview)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.saved_colors_canvas.configure(yscrollcommand=scrollbar.set)
+        self.palette_scrollbar = ttk.Scrollbar(saved_colors_outer_frame, orient=tk.VERTICAL,
+                                               command=self._on_palette_scroll)
+        self.palette_scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        # The frame only ever covers the visible viewport; rows are placed into it at their virtual offsets
         self.scrollable_frame = ttk.Frame(self.saved_colors_canvas, style="TFrame")
-        self.saved_colors_canvas.create_window((0, 0), window=self.scrollable_frame, anchor="nw")
-        self.scrollable_frame.bind("<Configure>", lambda e: self.saved_colors_canvas.configure(
-            scrollregion=self.saved_colors_canvas.bbox("all")))
+        self._palette_window = self.saved_colors_canvas.create_window((0, 0), window=self.scrollable_frame,
+                                                                      anchor="nw")
+        self.saved_colors_canvas.bind("<Configure>", self._on_palette_viewport_resize)
+        self.empty_palette_label = ttk.Label(self.scrollable_frame, text="No colors saved yet.", font=self.small_font)
         self.saved_colors_canvas.bind_all("<MouseWheel>", self._on_mousewheel)
         self.saved_colors_canvas.bind_all("<Button-4>", self._on_mousewheel)
         self.saved_colors_canvas.bind_all("<Button-5>", self._on_mousewheel)
 
         self.populate_saved_colors_display()
         self.update_color_preview()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(WRITER_POLL_MS, self._poll_writer_status)
 
     def _on_mousewheel(self, event):
         if event.num == 5 or event.delta < 0:
-            self.saved_colors_canvas.yview_scroll(1, "units")
+            self._scroll_palette_to(self._palette_top + PALETTE_ROW_HEIGHT)
         elif event.num == 4 or event.delta > 0:
-            self.saved_colors_canvas.yview_scroll(-1, "units")
+            self._scroll_palette_to(self._palette_top - PALETTE_ROW_HEIGHT)
+
+    def _on_palette_scroll(self, action, amount, unit=None):
+        if action == "moveto":
+            start, stop = self._page_bounds()
+            self._scroll_palette_to(float(amount) * (stop - start) * PALETTE_ROW_HEIGHT)
+        elif action == "scroll":
+            step = self.saved_colors_canvas.winfo_height() if unit == "pages" else PALETTE_ROW_HEIGHT
+            self._scroll_palette_to(self._palette_top + int(amount) * step)
+
+    def _on_palette_viewport_resize(self, event):
+        self.saved_colors_canvas.itemconfigure(self._palette_window, width=event.width, height=event.height)
+        self._scroll_palette_to(self._palette_top)
+
+    def _scroll_palette_to(self, top):
+        start, stop = self._page_bounds()
+        total_height = (stop - start) * PALETTE_ROW_HEIGHT
+        max_top = max(0, total_height - self.saved_colors_canvas.winfo_height())
+        self._palette_top = int(max(0, min(top, max_top)))
+        self._render_visible_rows()
 
     def _on_slider_change(self, pigment_key, value_str):
-        try:
-            f_val = float(value_str)
-            self.pigment_labels[pigment_key].set(f"{f_val:,.1f} %".replace('.', ','))
-        except ValueError:
-            self.pigment_labels[pigment_key].set("0,0 %")
+        self._pending_slider_keys.add(pigment_key)
+        if self._slider_flush_id is not None:  # A redraw is already queued for this frame
+            self.redraw_stats["skipped_coalesced"] += 1
+            return
+        self._slider_flush_id = self.root.after(PREVIEW_FRAME_MS, self._flush_slider_changes)
+
+    def _flush_slider_changes(self):
+        self._slider_flush_id = None
+        pending, self._pending_slider_keys = self._pending_slider_keys, set()
+        for pigment_key in pending:
+            try:
+                f_val = float(self.pigment_vars[pigment_key].get())
+                self.pigment_labels[pigment_key].set(f"{f_val:,.1f} %".replace('.', ','))
+            except (ValueError, tk.TclError):
+                self.pigment_labels[pigment_key].set("0,0 %")
         self.update_color_preview()
 
     def update_color_preview(self, event=None):
+        self._render_gamut_map()
         current_percentages = {key: var.get() for key, var in self.pigment_vars.items()}
-        mixed_rgb, hex_color = calculate_mixed_color(current_percentages), rgb_to_hex(
-            calculate_mixed_color(current_percentages))
+        mixed_rgb = calculate_mixed_color(current_percentages, self.registry)
+        hex_color = rgb_to_hex(mixed_rgb)
+        if hex_color == self._last_preview_hex:
+            self.redraw_stats["skipped_unchanged"] += 1
+            return
+        self._last_preview_hex = hex_color
+        self.redraw_stats["performed"] += 1
         self.color_preview.config(bg=hex_color)
         self.rgb_hex_label.config(
             text=f"RGB: ({int(mixed_rgb[0])},{int(mixed_rgb[1])},{int(mixed_rgb[2])})\nHEX: {hex_color.upper()}")
 
+    def _load_pigment_registry(self):
+        """Pigments come from $LAASTI_PIGMENT_CATALOG, else PIGMENT_CATALOG_FILE_NAME in the save
+        directory, else the built-in set."""
+        catalog_path = os.environ.get(PIGMENT_CATALOG_ENV_VAR)
+        if not catalog_path and (self.current_save_dir / PIGMENT_CATALOG_FILE_NAME).exists():
+            catalog_path = self.current_save_dir / PIGMENT_CATALOG_FILE_NAME
+        try:
+            return load_pigment_registry(catalog_path)
+        except (OSError, ValueError) as e:
+            messagebox.showwarning("Pigment Catalog", f"Could not load pigment catalog {catalog_path}:\n{e}\n"
+                                                      f"Using the built-in pigments.")
+            return DEFAULT_REGISTRY
+
+    @staticmethod
+    def _load_duplicate_delta_e(value=None):
+        """The duplicate check's ΔE threshold: value (--duplicate-delta-e), else $LAASTI_DUPLICATE_DELTA_E,
+        else DUPLICATE_DELTA_E. 0 turns the check off."""
+        value = value if value is not None else os.environ.get(DUPLICATE_DELTA_E_ENV_VAR)
+        if value is None or value == "":
+            return DUPLICATE_DELTA_E
+        try:
+            delta_e = parse_percentage(value)
+            if not delta_e >= 0 or math.isinf(delta_e):
+                raise ValueError("must be 0 or a positive number")
+        except ValueError as e:
+            messagebox.showwarning("Duplicate Check", f"Could not use ΔE threshold '{value}': {e}\n"
+                                                      f"Using the default of {DUPLICATE_DELTA_E:g}.")
+            return DUPLICATE_DELTA_E
+        return delta_e
+
     def _ensure_save_dir_exists(self):
         """Ensures the default save directory (Downloads/APP_DATA_SUBFOLDER_NAME) exists.
            Falls back to script's current directory if Downloads is not accessible.
@@ -236,57 +424,182 @@ class PigmentMixerApp:
 
     def load_saved_colors(self):
         # self.current_save_dir is set in __init__ by _ensure_save_dir_exists
-        # self.json_save_path is also set in __init__ based on self.current_save_dir
+        # self.palette_db_path is also set in __init__; the legacy JSON file is migrated on first open. Only this
+        # open creates the schema: if it fails, the writer's flushes fail too (and say so) rather than
+        # stamping an empty database that would never migrate the JSON palette
         try:
-            if self.json_save_path.exists():
-                with open(self.json_save_path, 'r') as f:
-                    self.saved_colors = json.load(f)
-            else:
-                self.saved_colors = []  # No file found, start fresh
+            store = PaletteStore(self.palette_db_path, legacy_json_path=self.json_save_path)
+            try:
+                self.saved_colors = {c['id']: c for c in store.iter_sorted()}
+            finally:
+                store.close()
         except Exception as e:
-            messagebox.showerror("Load Error", f"Could not load saved colors from {self.json_save_path}: {e}")
-            self.saved_colors = []
+            messagebox.showerror("Load Error", f"Could not load saved colors from {self.palette_db_path}: {e}\n"
+                                               f"Changes made now cannot be saved until the palette loads.")
+            self.saved_colors = {}
+        self.search_index, self.duplicate_index = self._build_palette_indexes(self.saved_colors)
+        if self.palette_writer is None:
+            self.palette_writer = PaletteWriter(self.palette_db_path, on_error=self._writer_errors.put)
+
+    def _build_palette_indexes(self, saved_colors):
+        """Fresh (search index, duplicate index) over saved_colors. Touches no widgets, so an import
+        worker can build them off the Tk thread."""
+        search_index = PaletteSearchIndex(self.registry)
+        search_index.rebuild(saved_colors.values())
+        duplicate_index = LabNeighborIndex()
+        if saved_colors:
+            duplicate_index.add_many(list(saved_colors), [c['rgb'] for c in saved_colors.values()])
+        return search_index, duplicate_index
+
+    def save_colors_to_file(self, *color_ids):
+        """Queues the current state of the given entries for the background writer (deleting ids no
+        longer in the palette). Without ids, the whole palette is written. Returns immediately."""
+        if self.palette_writer is None:
+            return
+        if not color_ids:
+            color_ids = self.saved_colors.keys()
+        self.palette_writer.submit(upserts=[self.saved_colors[cid] for cid in color_ids if cid in self.saved_colors],
+                                   deletes=[cid for cid in color_ids if cid not in self.saved_colors])
 
-    def save_colors_to_file(self):
-        # self.current_save_dir and self.json_save_path are already determined
+    def _poll_writer_status(self):
+        error = None
         try:
-            with open(self.json_save_path, 'w') as f:
-                json.dump(self.saved_colors, f, indent=4)
-        except Exception as e:
-            messagebox.showerror("Save Error", f"Could not save colors to {self.json_save_path}: {e}")
+            while True:
+                error = self._writer_errors.get_nowait()
+        except queue.Empty:
+            pass
+        if error is not None:
+            self._writer_error_shown = True
+            self.status_label.config(text=f"Could not save palette changes to {self.palette_db_path}: {error} "
+                                          f"(retrying)", foreground="#C62828")
+        elif self._writer_error_shown and not self.palette_writer.has_pending:
+            self._writer_error_shown = False
+            self.status_label.config(text="Palette changes saved.", foreground=COLOR_PALETTE["text_secondary"])
+        self.root.after(WRITER_POLL_MS, self._poll_writer_status)
+
+    def on_close(self):
+        # Settle unsaved palette changes before touching any running job, so answering "No" leaves it running
+        saved = self.palette_writer is None or self.palette_writer.flush(timeout=WRITER_CLOSE_TIMEOUT_S)
+        if not saved and not self._confirm_quit_unsaved():
+            return  # The writer keeps retrying in the background
+        jobs = list(self._jobs.values())
+        for job in jobs:
+            job["cancel"].set()
+        for job in jobs:
+            # Let the worker see the cancel and clean up (the export's .part and temp files); destroying the
+            # window would otherwise kill the daemon thread before its finally blocks run
+            job["thread"].join(timeout=JOB_CLOSE_TIMEOUT_S)
+        if self.palette_writer is not None:
+            # An import already past its point of no return has handed its colors to the writer meanwhile
+            if saved and jobs and not self.palette_writer.flush(timeout=WRITER_CLOSE_TIMEOUT_S) and \
+                    not self._confirm_quit_unsaved():
+                return
+            self.palette_writer.close(timeout=1)
+        self.root.destroy()
+
+    def _confirm_quit_unsaved(self):
+        return messagebox.askyesno("Save Error", f"Some palette changes could not be saved to "
+                                                 f"{self.palette_db_path}.\nQuit anyway?")
+
+    @staticmethod
+    def _palette_sort_key(color_data):
+        return (not color_data.get('favorite', False), color_data.get('timestamp', ''), color_data['id'])
+
+    def _palette_insert(self, color_data):
+        key = self._palette_sort_key(color_data)
+        pos = bisect.bisect_left(self._palette_keys, key)
+        self._palette_keys.insert(pos, key)
+        self._palette_ids.insert(pos, color_data['id'])
+
+    def _palette_remove(self, color_data):
+        pos = bisect.bisect_left(self._palette_keys, self._palette_sort_key(color_data))
+        if pos < len(self._palette_ids) and self._palette_ids[pos] == color_data['id']:
+            del self._palette_keys[pos], self._palette_ids[pos]
 
     def populate_saved_colors_display(self):
-        for widget in self.scrollable_frame.winfo_children(): widget.destroy()
-        sorted_colors = sorted(self.saved_colors, key=lambda x: (not x.get('favorite', False), x.get('timestamp', '')))
-        if not sorted_colors:
-            ttk.Label(self.scrollable_frame, text="No colors saved yet.", font=self.small_font).pack(pady=5)
+        """Rebuilds the palette view's ordering from self.saved_colors (used after loading), which the
+        store already yields in display order. Single add/delete/favorite changes go through
+        _palette_insert/_palette_remove instead."""
+        self._palette_keys = [self._palette_sort_key(c) for c in self.saved_colors.values()]
+        self._palette_ids = list(self.saved_colors)
+        self._refresh_palette_view()
+
+    def _refresh_palette_view(self, reset_position=False):
+        """Re-runs the active filter against the (already updated) search index and redraws the page."""
+        matches = self.search_index.search(self.palette_filter)
+        self._view_ids = self._palette_ids if matches is None else matches
+        if reset_position:
+            self._palette_page, self._palette_top = 0, 0
+        self._palette_page = min(self._palette_page, self._page_count() - 1)
+        self._update_palette_status()
+        self._scroll_palette_to(self._palette_top)
+
+    def _on_filter_change(self):
+        try:
+            palette_filter = PaletteFilter.parse(self.filter_var.get(), self.registry)
+        except FilterSyntaxError as e:
+            self.filter_status_label.config(text=str(e), foreground="#C62828")
             return
-        for color_data in sorted_colors:
-            color_id, recipe, hex_val, fav = color_data['id'], color_data['recipe'], color_data['hex'], color_data.get(
-                'favorite', False)
-            item_frame = ttk.Frame(self.scrollable_frame, padding=3, relief=tk.SOLID, borderwidth=1)
-            item_frame.pack(pady=2, padx=2, fill=tk.X)
-            swatch = tk.Canvas(item_frame, width=40, height=25, bg=hex_val, highlightthickness=1,
-                               highlightbackground=COLOR_PALETTE["swatch_border"])
-            swatch.pack(side=tk.LEFT, padx=(0, 5))
-            swatch.bind("<Button-1>", lambda e, r=recipe: self.apply_saved_color_recipe(r))
-            ToolTip(swatch, f"Apply: {recipe}")
-            star_char, star_color = ("★", COLOR_PALETTE["star_favorite"]) if fav else (
-            "☆", COLOR_PALETTE["text_secondary"])
-            fav_btn = tk.Button(item_frame, text=star_char, fg=star_color, relief=tk.FLAT,
-                                command=lambda cid=color_id: self.toggle_favorite_color(cid),
-                                font=('Helvetica', 11, 'bold'))
-            fav_btn.pack(side=tk.LEFT, padx=3)
-            ToolTip(fav_btn, "Toggle Favorite")
-            del_btn = ttk.Button(item_frame, text="Del", style="Small.TButton",
-                                 command=lambda cid=color_id: self.delete_saved_color(cid))
-            del_btn.pack(side=tk.RIGHT, padx=3)
-            ToolTip(del_btn, "Delete color")
-        self.root.update_idletasks()
-        self.saved_colors_canvas.configure(scrollregion=self.saved_colors_canvas.bbox("all"))
+        self.palette_filter = palette_filter
+        self._refresh_palette_view(reset_position=True)
+
+    def _page_count(self):
+        return max(1, -(-len(self._view_ids) // PALETTE_PAGE_SIZE))
+
+    def _page_bounds(self):
+        start = self._palette_page * PALETTE_PAGE_SIZE
+        return start, min(start + PALETTE_PAGE_SIZE, len(self._view_ids))
+
+    def _change_palette_page(self, step):
+        page = max(0, min(self._palette_page + step, self._page_count() - 1))
+        if page != self._palette_page:
+            self._palette_page, self._palette_top = page, 0
+            self._update_palette_status()
+            self._scroll_palette_to(0)
+
+    def _update_palette_status(self):
+        if self.palette_filter:
+            text = f"{len(self._view_ids):,} of {len(self.saved_colors):,} colors"
+        else:
+            text = f"{len(self.saved_colors):,} colors"
+        self.filter_status_label.config(text=text, foreground=COLOR_PALETTE["text_secondary"])
+        page_count = self._page_count()
+        self.page_label.config(text=f"Page {self._palette_page + 1} of {page_count}")
+        self.prev_page_button.state(["!disabled"] if self._palette_page > 0 else ["disabled"])
+        self.next_page_button.state(["!disabled"] if self._palette_page < page_count - 1 else ["disabled"])
+
+    def _render_visible_rows(self):
+        viewport_height = self.saved_colors_canvas.winfo_height()
+        page_start, page_stop = self._page_bounds()
+        total_height = (page_stop - page_start) * PALETTE_ROW_HEIGHT
+        if total_height:
+            self.palette_scrollbar.set(self._palette_top / total_height,
+                                       min(1.0, (self._palette_top + viewport_height) / total_height))
+            self.empty_palette_label.place_forget()
+        else:
+            self.palette_scrollbar.set(0.0, 1.0)
+            self.empty_palette_label.config(
+                text="No colors match the filter." if self.palette_filter else "No colors saved yet.")
+            self.empty_palette_label.place(relx=0.5, y=5, anchor="n")
+
+        # Grow the pool to cover the viewport plus one partially visible row; never shrink it
+        needed_rows = viewport_height // PALETTE_ROW_HEIGHT + 2
+        while len(self._palette_rows) < needed_rows:
+            self._palette_rows.append(PaletteRow(self, self.scrollable_frame))
+
+        first_index = self._palette_top // PALETTE_ROW_HEIGHT
+        for slot, row in enumerate(self._palette_rows):
+            index = first_index + slot
+            if slot >= needed_rows or page_start + index >= page_stop:
+                row.color_id = row.recipe = None
+                row.frame.place_forget()
+                continue
+            row.bind_entry(self.saved_colors[self._view_ids[page_start + index]])
+            row.frame.place(x=2, y=index * PALETTE_ROW_HEIGHT - self._palette_top + 2, relwidth=1.0, width=-4,
+                            height=PALETTE_ROW_HEIGHT - 4)
 
     def apply_saved_color_recipe(self, recipe):
-        for key in PIGMENT_ORDER:
+        for key in self.registry.order:
             val = recipe.get(key, 0.0)
             self.pigment_vars[key].set(val)
             self.pigment_labels[key].set(f"{val:,.1f} %".replace('.', ','))
@@ -297,114 +610,478 @@ class PigmentMixerApp:
         if not any(p > 0 for p in percentages.values()):
             messagebox.showinfo("Save Color", "No pigments selected.");
             return
-        rgb, hex_c = calculate_mixed_color(percentages), rgb_to_hex(calculate_mixed_color(percentages))
+        rgb = calculate_mixed_color(percentages, self.registry)
+        hex_c, lab = rgb_to_hex(rgb), rgb_to_lab(rgb)
+        similar = []
+        if self.duplicate_delta_e > 0:
+            similar = self.duplicate_index.query(lab, self.duplicate_delta_e, limit=5)
+        if similar:
+            choice = self.ask_reuse_similar_color(hex_c, similar)
+            if choice is None:  # Cancelled
+                return
+            if choice != "save":
+                self.apply_saved_color_recipe(self.saved_colors[choice]['recipe'])
+                self.scroll_palette_to_color(choice)
+                return
         entry = {"id": str(uuid.uuid4()), "recipe": percentages, "rgb": rgb, "hex": hex_c, "favorite": False,
                  "timestamp": datetime.now().isoformat()}
-        self.saved_colors.append(entry)
-        self.save_colors_to_file()
-        self.populate_saved_colors_display()
+        self.saved_colors[entry['id']] = entry
+        self._palette_version += 1
+        self.duplicate_index.add(entry['id'], lab)
+        self.search_index.add(entry)
+        self.save_colors_to_file(entry['id'])
+        self._palette_insert(entry)
+        self._refresh_palette_view()
         messagebox.showinfo("Color Saved", "Current color added to palette.")
 
+    def ask_reuse_similar_color(self, hex_c, similar):
+        """Lists saved colors within duplicate_delta_e of the color being saved. Returns the id of the
+        entry to reuse, "save" to add the new color anyway, or None if the user cancelled."""
+        choice = {"value": None}
+        win = tk.Toplevel(self.root)
+        win.title("Similar Color Already Saved")
+        win.configure(bg=COLOR_PALETTE["window_bg"])
+        win.transient(self.root)
+        frame = ttk.Frame(win, padding=8, style="TFrame")
+        frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(frame, text=f"{hex_c.upper()} is within ΔE {self.duplicate_delta_e:g} of these saved colors:",
+                  font=self.label_font).grid(row=0, column=0, columnspan=4, sticky='w', pady=(0, 6))
+
+        def choose(value):
+            choice["value"] = value
+            win.destroy()
+
+        for row, (delta_e, color_id) in enumerate(similar, start=1):
+            color_data = self.saved_colors[color_id]
+            tk.Canvas(frame, width=40, height=25, bg=color_data['hex'], highlightthickness=1,
+                      highlightbackground=COLOR_PALETTE["swatch_border"]).grid(row=row, column=0, pady=2)
+            ttk.Label(frame, text=f"ΔE {delta_e:.1f}".replace('.', ','), font=self.small_font).grid(row=row, column=1,
+                                                                                                   padx=5)
+            ttk.Label(frame, text=f"{color_data['hex'].upper()}  {color_data.get('timestamp', '')[:16]}",
+                      font=self.small_font).grid(row=row, column=2, sticky='w')
+            ttk.Button(frame, text="Reuse", style="Small.TButton",
+                       command=lambda cid=color_id: choose(cid)).grid(row=row, column=3, padx=3)
+        buttons = ttk.Frame(frame, style="TFrame")
+        buttons.grid(row=len(similar) + 1, column=0, columnspan=4, pady=(8, 0), sticky='e')
+        ttk.Button(buttons, text="Save Anyway", command=lambda: choose("save")).pack(side=tk.LEFT, padx=3)
+        ttk.Button(buttons, text="Cancel", command=lambda: choose(None)).pack(side=tk.LEFT, padx=3)
+        win.protocol("WM_DELETE_WINDOW", lambda: choose(None))
+        win.grab_set()
+        self.root.wait_window(win)
+        return choice["value"]
+
+    def scroll_palette_to_color(self, color_id):
+        color_data = self.saved_colors.get(color_id)
+        if color_data is None:
+            return
+        if self.palette_filter and color_id not in self._view_ids:
+            self.filter_var.set("")  # Show the whole palette again so the color is visible
+        if self.palette_filter:
+            pos = self._view_ids.index(color_id)
+        else:
+            pos = bisect.bisect_left(self._palette_keys, self._palette_sort_key(color_data))
+        self._palette_page = pos // PALETTE_PAGE_SIZE
+        self._update_palette_status()
+        self._scroll_palette_to((pos % PALETTE_PAGE_SIZE) * PALETTE_ROW_HEIGHT)
+
+    def get_match_index(self):
+        if self.match_index is None:
+            self.root.config(cursor="watch")
+            self.root.update_idletasks()
+            try:
+                self.match_index = RecipeMatchIndex.load_or_build(self.match_index_path, self.registry)
+            finally:
+                self.root.config(cursor="")
+        return self.match_index
+
+    def match_color_action(self):
+        text = simpledialog.askstring("Match Color", "Target color (HEX, e.g. #B08D6A, or R,G,B):", parent=self.root)
+        if not text:
+            return
+        try:
+            target_rgb = parse_color_string(text)
+        except ValueError as e:
+            messagebox.showerror("Match Color", f"Could not read color '{text}':\n{e}")
+            return
+        matches = self.get_match_index().query(target_rgb, k=8)
+        self.show_match_results(target_rgb, matches)
+
+    def show_match_results(self, target_rgb, matches):
+        win = tk.Toplevel(self.root)
+        win.title(f"Closest recipes for {rgb_to_hex(target_rgb).upper()}")
+        win.configure(bg=COLOR_PALETTE["window_bg"])
+        frame = ttk.Frame(win, padding=8, style="TFrame")
+        frame.pack(fill=tk.BOTH, expand=True)
+        ttk.Label(frame, text="Target", font=self.label_font).grid(row=0, column=0, sticky='w')
+        tk.Canvas(frame, width=40, height=25, bg=rgb_to_hex(target_rgb), highlightthickness=1,
+                  highlightbackground=COLOR_PALETTE["swatch_border"]).grid(row=0, column=1, sticky='w', pady=(0, 6))
+        for row, (distance, recipe, rgb) in enumerate(matches, start=1):
+            swatch = tk.Canvas(frame, width=40, height=25, bg=rgb_to_hex(rgb), highlightthickness=1,
+                               highlightbackground=COLOR_PALETTE["swatch_border"])
+            swatch.grid(row=row, column=1, sticky='w', pady=2)
+            recipe_text = ", ".join(f"{key} " + f"{recipe[key]:,.1f} %".replace('.', ',')
+                                    for key in self.registry.order if recipe[key] > 0) or "No pigment"
+            ttk.Label(frame, text=f"ΔRGB {distance:.1f}", font=self.small_font).grid(row=row, column=0, sticky='w')
+            ttk.Label(frame, text=recipe_text, font=self.small_font).grid(row=row, column=2, sticky='w', padx=5)
+            apply_btn = ttk.Button(frame, text="Apply", style="Small.TButton",
+                                   command=lambda r=recipe: self.apply_saved_color_recipe(r))
+            apply_btn.grid(row=row, column=3, padx=3)
+            swatch.bind("<Button-1>", lambda e, r=recipe: self.apply_saved_color_recipe(r))
+            ToolTip(swatch, f"Apply: {recipe}")
+
+    def open_gamut_map(self):
+        if self.gamut_window is not None:
+            self.gamut_window.lift()
+            return
+        if len(self.registry) < 2:
+            messagebox.showinfo("Gamut Map", "The gamut map needs at least two pigments.")
+            return
+        win = tk.Toplevel(self.root)
+        win.title("Gamut Map")
+        win.configure(bg=COLOR_PALETTE["window_bg"])
+        win.transient(self.root)
+        win.resizable(False, False)
+        frame = ttk.Frame(win, padding=8, style="TFrame")
+        frame.pack(fill=tk.BOTH, expand=True)
+        names = [self.registry.short_name(key) for key in self.registry.order]
+        ttk.Label(frame, text="Across (→)", font=self.label_font).grid(row=0, column=0, sticky='w')
+        ttk.Label(frame, text="Up (↑)", font=self.label_font).grid(row=0, column=1, sticky='w')
+        self.gamut_axis_boxes = []
+        for column, default in enumerate((1, 2 if len(names) > 2 else 0)):
+            box = ttk.Combobox(frame, values=names, state="readonly", width=24)
+            box.current(default)
+            box.grid(row=1, column=column, sticky='ew', padx=(0, 5), pady=(0, 6))
+            box.bind("<<ComboboxSelected>>", lambda e, changed=column: self._on_gamut_axis_selected(changed))
+            self.gamut_axis_boxes.append(box)
+        self.gamut_canvas = tk.Canvas(frame, width=GAMUT_MAP_SIZE, height=GAMUT_MAP_SIZE, borderwidth=0,
+                                      highlightthickness=0, cursor="crosshair")
+        self.gamut_canvas.grid(row=2, column=0, columnspan=2)
+        self._gamut_image_item = self.gamut_canvas.create_image(0, 0, anchor="nw")
+        self._gamut_marker = self.gamut_canvas.create_oval(0, 0, 0, 0, outline="#FFFFFF", width=2)
+        self.gamut_canvas.bind("<Button-1>", self._on_gamut_map_click)
+        self.gamut_canvas.bind("<Motion>", self._on_gamut_map_hover)
+        self.gamut_hover_label = ttk.Label(frame, text="Click to apply a recipe.", font=self.small_font)
+        self.gamut_hover_label.grid(row=3, column=0, columnspan=2, sticky='w')
+        win.protocol("WM_DELETE_WINDOW", self._close_gamut_map)
+        self.gamut_window = win
+        self._render_gamut_map()
+
+    def _close_gamut_map(self):
+        self.gamut_window.destroy()
+        self.gamut_window, self._gamut_state = None, None
+        self._gamut_images.clear()
+
+    def _gamut_axes(self):
+        return tuple(self.registry.order[box.current()] for box in self.gamut_axis_boxes)
+
+    def _on_gamut_axis_selected(self, changed):
+        # Both axes on one pigment is not a field; move the other axis off it
+        other = self.gamut_axis_boxes[1 - changed]
+        if other.current() == self.gamut_axis_boxes[changed].current():
+            other.current((other.current() + 1) % len(self.registry))
+        self._render_gamut_map()
+
+    def _render_gamut_map(self):
+        """Shows the field of the chosen pigment pair at the current values of the other sliders, and
+        marks the current recipe on it. A field is only mixed when the pair or a fixed slider (at the
+        0.1 % resolution recipes are saved at) changed, and recently shown fields come from the cache."""
+        if self.gamut_window is None:
+            return
+        x_key, y_key = self._gamut_axes()
+        fixed = tuple((key, round(self.pigment_vars[key].get(), 1)) for key in self.registry.order
+                      if key not in (x_key, y_key))
+        state = (x_key, y_key, fixed)
+        if state != self._gamut_state:
+            image = self._gamut_images.pop(state, None)
+            if image is None:
+                field = mix_pigment_pair_field(dict(fixed), x_key, y_key, GAMUT_MAP_SIZE, GAMUT_MAP_SIZE,
+                                               max_percent=GAMUT_MAP_MAX_PERCENT, registry=self.registry)
+                image = tk.PhotoImage(master=self.gamut_canvas, width=GAMUT_MAP_SIZE, height=GAMUT_MAP_SIZE)
+                image.put(photo_image_rows(field), to=(0, 0))
+                while len(self._gamut_images) >= GAMUT_MAP_CACHE_SIZE:
+                    self._gamut_images.popitem(last=False)
+            self._gamut_images[state] = image
+            self._gamut_state = state
+            self.gamut_canvas.itemconfigure(self._gamut_image_item, image=image)
+        scale = (GAMUT_MAP_SIZE - 1) / GAMUT_MAP_MAX_PERCENT
+        x = min(max(self.pigment_vars[x_key].get(), 0.0), GAMUT_MAP_MAX_PERCENT) * scale
+        y = (GAMUT_MAP_MAX_PERCENT - min(max(self.pigment_vars[y_key].get(), 0.0), GAMUT_MAP_MAX_PERCENT)) * scale
+        self.gamut_canvas.coords(self._gamut_marker, x - 5, y - 5, x + 5, y + 5)
+
+    def _gamut_map_recipe_at(self, px, py):
+        x_key, y_key, fixed = self._gamut_state
+        px, py = min(max(px, 0), GAMUT_MAP_SIZE - 1), min(max(py, 0), GAMUT_MAP_SIZE - 1)
+        recipe = dict(fixed)
+        recipe[x_key] = round(px / (GAMUT_MAP_SIZE - 1) * GAMUT_MAP_MAX_PERCENT, 1)
+        recipe[y_key] = round((GAMUT_MAP_SIZE - 1 - py) / (GAMUT_MAP_SIZE - 1) * GAMUT_MAP_MAX_PERCENT, 1)
+        return recipe
+
+    def _on_gamut_map_hover(self, event):
+        recipe = self._gamut_map_recipe_at(event.x, event.y)
+        x_key, y_key, _ = self._gamut_state
+        hex_c = rgb_to_hex(calculate_mixed_color(recipe, self.registry))
+        self.gamut_hover_label.config(
+            text=" · ".join(f"{self.registry.short_name(key)} " + f"{recipe[key]:,.1f} %".replace('.', ',')
+                            for key in (x_key, y_key)) + f"  {hex_c.upper()}")
+
+    def _on_gamut_map_click(self, event):
+        self.apply_saved_color_recipe(self._gamut_map_recipe_at(event.x, event.y))
+
     def delete_saved_color(self, color_id):
-        self.saved_colors = [c for c in self.saved_colors if c['id'] != color_id]
-        self.save_colors_to_file()
-        self.populate_saved_colors_display()
+        color_data = self.saved_colors.pop(color_id, None)
+        self._palette_version += 1
+        self.duplicate_index.remove(color_id)
+        self.search_index.remove(color_id)
+        self.save_colors_to_file(color_id)
+        if color_data is not None:
+            self._palette_remove(color_data)
+        self._refresh_palette_view()
 
     def toggle_favorite_color(self, color_id):
-        for c in self.saved_colors:
-            if c['id'] == color_id: c['favorite'] = not c.get('favorite', False); break
-        self.save_colors_to_file()
-        self.populate_saved_colors_display()
+        color_data = self.saved_colors.get(color_id)
+        if color_data is None:
+            return
+        self._palette_remove(color_data)
+        self._palette_version += 1
+        color_data['favorite'] = not color_data.get('favorite', False)
+        self._palette_insert(color_data)
+        self.search_index.add(color_data)
+        self.save_colors_to_file(color_id)
+        self._refresh_palette_view()
 
     def export_palette_to_excel(self):
         if not self.saved_colors:
             messagebox.showinfo("Export Empty", "No colors in palette.");
             return
+        if "export" in self._jobs:
+            messagebox.showinfo("Export Running", "An export is already in progress.")
+            return
+
+        export_ids = self._palette_ids
+        if self.palette_filter and len(self._view_ids) < len(self._palette_ids):
+            answer = messagebox.askyesnocancel(
+                "Export Palette", f"Export only the {len(self._view_ids):,} colors matching the filter?\n"
+                                  f"(No exports all {len(self._palette_ids):,} saved colors.)")
+            if answer is None:
+                return
+            if answer:
+                export_ids = self._view_ids
+        if not export_ids:
+            messagebox.showinfo("Export Empty", "No colors match the filter.")
+            return
 
         # Use the already determined current_save_dir for export
         export_dir = self.current_save_dir
         filepath = export_dir / f"custom_palette_export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        # Snapshot in view order (already sorted) so the worker never sees edits made while it runs
+        palette_entries = [dict(self.saved_colors[cid]) for cid in export_ids]
 
-        wb = openpyxl.Workbook();
-        ws = wb.active;
-        ws.title = "Custom Color Palette"
-        ws['A1'] = "Custom Pigment Palette Export";
-        ws['A1'].font = Font(bold=True, size=14)
-        ws['A2'] = f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-
-        row_idx = 4
-        headers = ["Favorite", "Visual Color", "Saved ID (Timestamp)"] + \
-                  [PIGMENT_DATA[pk]["name_full"].split(',')[0] + " (%)" for pk in PIGMENT_ORDER] + \
-                  ["Test Mortar Amount (g)", "Test Water Amount (g)"] + \
-                  ["Calc. " + PIGMENT_DATA[pk]["name_full"].split(',')[0] + " for Test (g)" for pk in PIGMENT_ORDER] + \
-                  ["Notes"]
-
-        for col, h_text in enumerate(headers, 1):
-            cell = ws.cell(row=row_idx, column=col, value=h_text)
-            cell.font = Font(bold=True)
-            cell.alignment = Alignment(wrap_text=True, horizontal='center', vertical='center')
-        row_idx += 1
-
-        sorted_colors = sorted(self.saved_colors, key=lambda x: (not x.get('favorite', False), x.get('timestamp', '')))
-        DEFAULT_TEST_MORTAR_G = 20.0
-
-        pigment_percentage_cols_letters = [openpyxl.utils.get_column_letter(4 + i) for i in range(len(PIGMENT_ORDER))]
-        test_mortar_col_letter = openpyxl.utils.get_column_letter(4 + len(PIGMENT_ORDER))
-        calculated_pigment_cols_start_idx = 4 + len(PIGMENT_ORDER) + 2
-
-        for c_data in sorted_colors:
-            ws.cell(row=row_idx, column=1, value="★" if c_data.get('favorite') else "")
-            excel_hex = hex_to_excel_rgb(c_data['hex'])
-            ws.cell(row=row_idx, column=2).fill = PatternFill(start_color=excel_hex, end_color=excel_hex,
-                                                              fill_type="solid")
-            ws.cell(row=row_idx, column=3, value=c_data.get('timestamp', c_data['id']))
-
-            for i, pk in enumerate(PIGMENT_ORDER):
-                stored_perc_val = c_data['recipe'].get(pk, 0.0)
-                excel_decimal_val = stored_perc_val / 100.0
-                cell = ws.cell(row=row_idx, column=4 + i, value=excel_decimal_val)
-                cell.number_format = '0.0%'
-
-            test_mortar_cell = ws.cell(row=row_idx, column=len(PIGMENT_ORDER) + 4, value=DEFAULT_TEST_MORTAR_G)
-            test_mortar_cell.number_format = '0'
-            ws.cell(row=row_idx, column=len(PIGMENT_ORDER) + 5, value="")
-
-            for i, pk in enumerate(PIGMENT_ORDER):
-                perc_cell_char = pigment_percentage_cols_letters[i]
-                mortar_cell_char = test_mortar_col_letter
-                formula = f"={perc_cell_char}{row_idx}*{mortar_cell_char}{row_idx}"
-                calc_cell = ws.cell(row=row_idx, column=calculated_pigment_cols_start_idx + i, value=formula)
-                calc_cell.number_format = '0,000'
-
-            ws.cell(row=row_idx, column=len(headers), value="")
-            row_idx += 1
-
-        for i, col_char in enumerate([openpyxl.utils.get_column_letter(j + 1) for j in range(len(headers))]):
-            max_len = len(str(headers[i]))
-            for r_num in range(5, row_idx):
-                cell = ws.cell(row=r_num, column=i + 1)
-                cell_v_str = ""
-                if cell.value is not None:
-                    if cell.number_format == '0.0%' and isinstance(cell.value, (int, float)):
-                        display_percentage_number = cell.value * 100
-                        cell_v_str = f"{display_percentage_number:,.1f}%".replace('.', ',')
-                    elif isinstance(cell.value, (int, float)) and cell.number_format == '0,000':
-                        cell_v_str = f"{cell.value:,.3f}".replace('.', ',')
-                    else:
-                        cell_v_str = str(cell.value)
-                max_len = max(max_len, len(cell_v_str))
-            adjusted_width = 12 if i == 1 else (max_len + 2.5)
-            ws.column_dimensions[col_char].width = max(adjusted_width, 10)
+        def run_export(cancel_event, post):
+            finished = write_palette_xlsx(filepath, palette_entries, registry=self.registry,
+                                          progress_callback=lambda done, total: post("progress", done),
+                                          cancel_event=cancel_event)
+            return ("done", None) if finished else ("cancelled", None)
 
-        try:
-            wb.save(filepath)
+        self._start_background_job("export", "Exporting Palette", f"Exporting {len(palette_entries)} colors...",
+                                   run_export, self._on_export_message, self._on_export_outcome,
+                                   maximum=len(palette_entries), filepath=filepath)
+
+    @staticmethod
+    def _on_export_message(job, kind, payload):
+        job["progress"]["value"] = payload  # "progress": entries written so far
+
+    def _on_export_outcome(self, job, kind, payload):
+        filepath = job["filepath"]
+        if kind == "done":
             messagebox.showinfo("Export Successful",
                                 f"Palette exported to:\n{filepath.resolve()}")  # Show resolved path
-        except Exception as e:
-            messagebox.showerror("Export Error", f"Could not save Excel to {filepath.resolve()}:\n{e}")
+        elif kind == "cancelled":
+            messagebox.showinfo("Export Cancelled", "Palette export was cancelled.")
+        else:
+            messagebox.showerror("Export Error", f"Could not save Excel to {filepath.resolve()}:\n{payload}")
+
+    def import_palette_action(self):
+        if "import" in self._jobs:
+            messagebox.showinfo("Import Running", "An import is already in progress.")
+            return
+        patterns = " ".join(f"*{suffix}" for suffix in IMPORT_FORMATS)
+        filepath = filedialog.askopenfilename(parent=self.root, title="Import Palette",
+                                              initialdir=str(self.current_save_dir),
+                                              filetypes=[("Palettes", patterns), ("All files", "*.*")])
+        if not filepath:
+            return
+        filepath = Path(filepath)
+        # The worker merges into a snapshot; _finish_import redoes the merge if the palette changed meanwhile
+        snapshot, version = dict(self.saved_colors), self._palette_version
+
+        def run_import(cancel_event, post):
+            result = read_palette_import(filepath, self.registry, snapshot,
+                                         progress_callback=lambda rows: post("progress", rows),
+                                         cancel_event=cancel_event)
+            if result is None or cancel_event.is_set():
+                return "cancelled", None
+            entries = result[0]
+            post("saving", len(entries))
+            if entries:
+                self.palette_writer.submit(upserts=entries)  # Written in one transaction by the writer thread
+            snapshot.update((entry['id'], entry) for entry in entries)
+            merged = {c['id']: c for c in sorted(snapshot.values(), key=self._palette_sort_key)}
+            return "done", (result, merged, self._build_palette_indexes(merged))
+
+        self._start_background_job("import", "Importing Palette", f"Reading {filepath.name}...", run_import,
+                                   self._on_import_message, self._on_import_outcome,
+                                   filepath=filepath, version=version)
+
+    @staticmethod
+    def _on_import_message(job, kind, payload):
+        if kind == "progress":
+            job["status"].config(text=f"Read {payload:,} rows of {job['filepath'].name}...")
+        elif kind == "saving":
+            job["status"].config(text=f"Adding {payload:,} colors to the palette...")
+            job["cancel_button"].state(["disabled"])
+
+    def _on_import_outcome(self, job, kind, payload):
+        if kind == "done":
+            self._finish_import(job, *payload)
+        elif kind == "cancelled":
+            messagebox.showinfo("Import Cancelled", "Palette import was cancelled; no colors were added.")
+        else:
+            messagebox.showerror("Import Error", f"Could not import {job['filepath']}:\n{payload}")
+
+    def _finish_import(self, job, result, merged, indexes):
+        entries, rows_read, duplicates = result
+        if job["version"] != self._palette_version:
+            # Colors were saved, deleted or starred during the import: merge into the current palette instead,
+            # keeping whichever copy of an id is newer, and queue the winners again so the store agrees
+            merged = dict(self.saved_colors)
+            for entry in entries:
+                current = merged.get(entry['id'])
+                if current is None or entry['timestamp'] > current.get('timestamp', ''):
+                    merged[entry['id']] = entry
+            merged = {c['id']: c for c in sorted(merged.values(), key=self._palette_sort_key)}
+            indexes = self._build_palette_indexes(merged)
+            winners = [entry['id'] for entry in entries if merged.get(entry['id']) is entry]
+            if winners:
+                self.save_colors_to_file(*winners)
+        self.saved_colors = merged
+        self.search_index, self.duplicate_index = indexes
+        self._palette_version += 1
+        self.populate_saved_colors_display()
+        messagebox.showinfo("Import Finished",
+                            f"Imported {len(entries):,} colors from {job['filepath'].name}.\n"
+                            f"Rows read: {rows_read:,}; skipped as already saved: {duplicates:,}.")
+
+    def _start_background_job(self, name, title, status_text, work, on_message, on_outcome, maximum=None,
+                              **details):
+        """Runs work(cancel_event, post) on a worker thread behind a progress dialog with a Cancel button.
+
+        work reports through post(kind, payload) and returns its outcome, ("done", payload) or
+        ("cancelled", None); an exception it raises becomes ("error", exception). _poll_background_job
+        hands the reports to on_message(job, kind, payload) on the Tk thread, then closes the dialog and
+        calls on_outcome(job, kind, payload). The progress bar is determinate up to maximum, or spins
+        without one. Until then the job (widgets, "cancel", "thread" and the details) is self._jobs[name]."""
+        cancel_event, messages = threading.Event(), queue.Queue()
+        dialog = tk.Toplevel(self.root)
+        dialog.title(title)
+        dialog.configure(bg=COLOR_PALETTE["window_bg"])
+        dialog.transient(self.root)
+        dialog.resizable(False, False)
+        body = ttk.Frame(dialog, padding=10, style="TFrame")
+        body.pack(fill=tk.BOTH, expand=True)
+        status_label = ttk.Label(body, text=status_text, font=self.label_font)
+        status_label.pack(fill=tk.X)
+        if maximum is None:
+            progress = ttk.Progressbar(body, orient=tk.HORIZONTAL, length=280, mode='indeterminate')
+            progress.start(20)
+        else:
+            progress = ttk.Progressbar(body, orient=tk.HORIZONTAL, length=280, mode='determinate',
+                                       maximum=max(maximum, 1))
+        progress.pack(fill=tk.X, pady=6)
+        cancel_button = ttk.Button(body, text="Cancel", style="Small.TButton", command=cancel_event.set)
+        cancel_button.pack()
+        dialog.protocol("WM_DELETE_WINDOW", cancel_event.set)
+
+        def run():
+            try:
+                outcome = work(cancel_event, lambda kind, payload: messages.put((kind, payload)))
+            except Exception as e:  # Reported on the Tk thread by on_outcome
+                outcome = ("error", e)
+            messages.put(outcome)
+
+        job = dict(details, thread=threading.Thread(target=run, daemon=True), cancel=cancel_event, messages=messages,
+                   dialog=dialog, progress=progress, status=status_label, cancel_button=cancel_button,
+                   on_message=on_message, on_outcome=on_outcome)
+        self._jobs[name] = job
+        job["thread"].start()
+        self.root.after(100, self._poll_background_job, name)
+
+    def _poll_background_job(self, name):
+        job = self._jobs[name]
+        outcome = None
+        try:
+            while True:
+                kind, payload = job["messages"].get_nowait()
+                if kind in ("done", "cancelled", "error"):
+                    outcome = (kind, payload)
+                else:
+                    job["on_message"](job, kind, payload)
+        except queue.Empty:
+            pass
+        if outcome is None:
+            if job["cancel"].is_set():
+                job["status"].config(text="Cancelling...")
+                job["cancel_button"].state(["disabled"])
+            self.root.after(100, self._poll_background_job, name)
+            return
+
+        job["dialog"].destroy()
+        del self._jobs[name]
+        job["on_outcome"](job, *outcome)
+
+
+def count_widgets(widget):
+    """Number of widgets below widget, at any depth."""
+    return sum(1 + count_widgets(child) for child in widget.winfo_children())
+
+
+def enable_instrumentation(report_path=None, cprofile_path=None):
+    """Wraps the hot paths in timers if profiling was requested (see laasti_profiling); must run
+    before the app is created. Returns the Instrumentation, or None when profiling is off."""
+    instrumentation = Instrumentation.from_settings(report_path, cprofile_path)
+    if instrumentation is None:
+        return None
+    instrumentation.instrument_class(PigmentMixerApp, PROFILED_METHODS)
+    # save_colors_to_file and export_palette_to_excel hand their work to threads; time that work too
+    instrumentation.instrument_class(PaletteStore, ["write"])
+    instrumentation.instrument_function(sys.modules[__name__], "write_palette_xlsx")
+    return instrumentation
+
+
+def build_arg_parser():
+    parser = argparse.ArgumentParser(description="Weber AK pigment mixer.")
+    parser.add_argument("--profile", nargs="?", const="1", metavar="REPORT",
+                        help=f"time the hot paths and write a JSON report on exit "
+                             f"(default: {PROFILE_ENV_VAR}, else off)")
+    parser.add_argument("--cprofile", metavar="PATH",
+                        help=f"also write cProfile stats to PATH (default: {CPROFILE_ENV_VAR}, else off)")
+    parser.add_argument("--duplicate-delta-e", metavar="DELTA_E",
+                        help=f"warn when a saved color is within this CIE76 ΔE of the new one; 0 turns the check "
+                             f"off (default: {DUPLICATE_DELTA_E_ENV_VAR}, else {DUPLICATE_DELTA_E:g})")
+    return parser
 
 
 if __name__ == "__main__":
+    args = build_arg_parser().parse_args()
+    instrumentation = enable_instrumentation(args.profile, args.cprofile)
     root = tk.Tk()
-    app = PigmentMixerApp(root)
+    app = PigmentMixerApp(root, duplicate_delta_e=args.duplicate_delta_e)
+    if instrumentation is not None:
+        instrumentation.add_gauge("scrollable_frame_widgets", lambda: count_widgets(app.scrollable_frame))
+
+        def sample_gauges():
+            instrumentation.sample_gauges()
+            root.after(PROFILE_SAMPLE_MS, sample_gauges)
+        sample_gauges()
     root.mainloop()
+    if instrumentation is not None:
+        print(f"Profile report written to {instrumentation.finish().resolve()}")
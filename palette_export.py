@@ -0,0 +1,132 @@
+"""Excel export of the saved color palette.
+
+openpyxl is only imported when an export actually runs, so importing this module stays cheap."""
+import os
+from datetime import datetime
+from pathlib import Path
+
+from laasti_core import DEFAULT_REGISTRY, hex_to_excel_rgb
+
+DEFAULT_TEST_MORTAR_G = 20.0
+EXPORT_PROGRESS_EVERY = 500  # Rows between progress callbacks / cancellation checks during export
+
+
+def palette_export_headers(registry=None):
+    registry = registry or DEFAULT_REGISTRY
+    return ["Favorite", "Visual Color", "Saved ID (Timestamp)"] + \
+           [registry.short_name(pk) + " (%)" for pk in registry.order] + \
+           ["Test Mortar Amount (g)", "Test Water Amount (g)"] + \
+           ["Calc. " + registry.short_name(pk) + " for Test (g)" for pk in registry.order] + \
+           ["Notes"]
+
+
+def _palette_export_row(c_data, row_idx, pigment_order, pigment_percentage_cols_letters, test_mortar_col_letter):
+    """Plain cell values of one exported palette row (the Visual Color column only carries a fill)."""
+    return (["★" if c_data.get('favorite') else "", None, c_data.get('timestamp', c_data['id'])] +
+            [c_data['recipe'].get(pk, 0.0) / 100.0 for pk in pigment_order] +
+            [DEFAULT_TEST_MORTAR_G, ""] +
+            [f"={perc_col}{row_idx}*{test_mortar_col_letter}{row_idx}" for perc_col in pigment_percentage_cols_letters] +
+            [""])
+
+
+def _palette_export_display_len(value, number_format):
+    """Length of a cell value as shown in Excel, used for column sizing."""
+    if value is None:
+        return 0
+    if number_format == '0.0%' and isinstance(value, (int, float)):
+        return len(f"{value * 100:,.1f}%".replace('.', ','))
+    if number_format == '0,000' and isinstance(value, (int, float)):
+        return len(f"{value:,.3f}".replace('.', ','))
+    return len(str(value))
+
+
+def _discard_write_only_sheet(ws):
+    """Closes a write-only sheet and removes the temp file openpyxl streams its rows into. After a
+    successful save openpyxl has already done both; after a cancel or error this is the only cleanup
+    short of process exit."""
+    if not ws.closed:
+        ws.close()
+    writer = ws._writer
+    if writer is not None and isinstance(writer.out, str) and os.path.exists(writer.out):
+        writer.cleanup()
+
+
+def write_palette_xlsx(filepath, palette_entries, progress_callback=None, cancel_event=None, registry=None):
+    """Streams palette_entries (already in display order) into an .xlsx using a write-only workbook,
+    with one percentage and one gram column per pigment in the registry.
+
+    Column widths go into the sheet header, which write-only mode emits with the first row, so they
+    are measured from the plain row values first and the rows are then streamed without keeping any
+    cell objects around. progress_callback(rows_done, rows_total) is called every EXPORT_PROGRESS_EVERY
+    rows. Returns False (and leaves no file behind) if cancel_event gets set."""
+    import openpyxl
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import PatternFill, Font, Alignment  # For cell coloring and formatting
+    from openpyxl.utils import get_column_letter
+
+    registry = registry or DEFAULT_REGISTRY
+    headers = palette_export_headers(registry)
+    pigment_count = len(registry)
+    number_formats = [None] * 3 + ['0.0%'] * pigment_count + ['0', None] + ['0,000'] * pigment_count + [None]
+    first_data_row, total = 5, len(palette_entries)
+    column_letters = (registry.order, [get_column_letter(4 + i) for i in range(pigment_count)],
+                      get_column_letter(4 + pigment_count))
+
+    max_lens = [len(str(h)) for h in headers]
+    for offset, c_data in enumerate(palette_entries):
+        for i, value in enumerate(_palette_export_row(c_data, first_data_row + offset, *column_letters)):
+            max_lens[i] = max(max_lens[i], _palette_export_display_len(value, number_formats[i]))
+        if cancel_event is not None and offset % EXPORT_PROGRESS_EVERY == 0 and cancel_event.is_set():
+            return False
+
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Custom Color Palette")
+    try:
+        for i, max_len in enumerate(max_lens):
+            adjusted_width = 12 if i == 1 else (max_len + 2.5)
+            ws.column_dimensions[get_column_letter(i + 1)].width = max(adjusted_width, 10)
+
+        title_cell = WriteOnlyCell(ws, value="Custom Pigment Palette Export")
+        title_cell.font = Font(bold=True, size=14)
+        ws.append([title_cell])
+        ws.append([f"Timestamp: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"])
+        ws.append([])
+        header_cells = []
+        for h_text in headers:
+            cell = WriteOnlyCell(ws, value=h_text)
+            cell.font = Font(bold=True)
+            cell.alignment = Alignment(wrap_text=True, horizontal='center', vertical='center')
+            header_cells.append(cell)
+        ws.append(header_cells)
+
+        for offset, c_data in enumerate(palette_entries):
+            row_cells = []
+            for i, value in enumerate(_palette_export_row(c_data, first_data_row + offset, *column_letters)):
+                cell = WriteOnlyCell(ws, value=value)
+                if number_formats[i]:
+                    cell.number_format = number_formats[i]
+                row_cells.append(cell)
+            excel_hex = hex_to_excel_rgb(c_data['hex'])
+            row_cells[1].fill = PatternFill(start_color=excel_hex, end_color=excel_hex, fill_type="solid")
+            ws.append(row_cells)
+            if offset % EXPORT_PROGRESS_EVERY == 0:
+                if cancel_event is not None and cancel_event.is_set():
+                    return False
+                if progress_callback is not None:
+                    progress_callback(offset, total)
+
+        # Save next to the target and rename, so a failed or cancelled export never leaves a partial file
+        tmp_path = Path(filepath).with_suffix(".xlsx.part")
+        try:
+            wb.save(tmp_path)
+            if cancel_event is not None and cancel_event.is_set():
+                return False
+            os.replace(tmp_path, filepath)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+    finally:
+        _discard_write_only_sheet(ws)
+    if progress_callback is not None:
+        progress_callback(total, total)
+    return True
@@ -0,0 +1,226 @@
+"""Streaming import of palettes from the Excel export, CSV files (e.g. from a LIMS) and JSON / JSON Lines.
+
+Rows are read one at a time (openpyxl read-only mode for .xlsx, csv and line readers otherwise), mixed
+in IMPORT_BATCH_SIZE batches with calculate_mixed_colors_batch, and only the resulting entries are
+kept. openpyxl is only imported when an .xlsx file is read, so importing this module stays cheap."""
+import csv
+import json
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+
+from laasti_core import DEFAULT_REGISTRY, calculate_mixed_colors_batch, parse_percentage, rgb_to_hex
+
+IMPORT_BATCH_SIZE = 4096  # Recipes mixed per vectorized batch
+IMPORT_PROGRESS_EVERY = 1000  # Rows between progress callbacks / cancellation checks
+IMPORT_HEADER_SCAN_ROWS = 20  # Rows searched for the header row (the export has a title block above it)
+# Rows without an id get a uuid5 of their timestamp and recipe in this namespace, so importing the
+# same file twice yields the same ids and the second import is recognized as duplicates
+IMPORT_ID_NAMESPACE = uuid.UUID("5d1c4f9e-3a7b-4e0a-9c61-2f8b6a0d7e13")
+IMPORT_FORMATS = {".xlsx": "xlsx", ".xlsm": "xlsx", ".csv": "csv", ".tsv": "csv", ".txt": "csv",
+                  ".json": "json", ".jsonl": "jsonl", ".ndjson": "jsonl"}
+TRUE_STRINGS = {"1", "true", "yes", "y", "x", "★", "fav", "favorite"}
+
+
+class PaletteImportError(ValueError):
+    def __init__(self, row_no, message):
+        super().__init__(f"row {row_no}: {message}" if row_no else str(message))
+
+
+def _normalize_header(text):
+    text = str(text or "").strip().lower()
+    for suffix in ("(%)", "%"):
+        if text.endswith(suffix):
+            text = text[:-len(suffix)].strip()
+    return text
+
+
+def _parse_favorite(value):
+    if isinstance(value, (bool, int, float)):
+        return bool(value)
+    return str(value or "").strip().lower() in TRUE_STRINGS
+
+
+def _recipe_key(recipe, registry):
+    return tuple(round(float(recipe.get(key, 0.0)), 6) for key in registry.order)
+
+
+def _column_map(header, registry):
+    """Maps header cells to fields: pigment keys (by key or short name, with or without "(%)"), "id",
+    "timestamp", "favorite" and the export's "Saved ID (Timestamp)". Other columns are ignored.
+    Returns {column index: field}, or None if the row names no pigment."""
+    names = {key.lower(): key for key in registry.order}
+    names.update({registry.short_name(key).lower(): key for key in registry.order})
+    names.update({"id": "id", "timestamp": "timestamp", "saved id (timestamp)": "saved_id",
+                  "favorite": "favorite", "favourite": "favorite"})
+    columns = {i: names[_normalize_header(cell)] for i, cell in enumerate(header) if _normalize_header(cell) in names}
+    return columns if set(columns.values()) & set(registry.order) else None
+
+
+def _row_fields(row_no, values, columns, registry, percent_scale):
+    """(row_no, id, timestamp, favorite, percentages) of one data row, or None for a blank row."""
+    fields = {field: values[i] if i < len(values) else None for i, field in columns.items()}
+    if all(value in (None, "") for value in fields.values()):
+        return None
+    try:
+        percentages = []
+        for key in registry.order:
+            value = fields.get(key)
+            # Excel percent cells hold fractions (2.5 % is 0.025); rounding drops the float noise of * 100
+            percentages.append(round(value * percent_scale, 6) if isinstance(value, (int, float))
+                               else parse_percentage(value))
+    except ValueError as e:
+        raise PaletteImportError(row_no, e) from None
+    color_id = str(fields.get("id") or "").strip()
+    timestamp = fields.get("timestamp")
+    if timestamp is None and "saved_id" in fields:
+        # The export writes the timestamp into "Saved ID (Timestamp)", or the id for entries without one
+        timestamp = str(fields["saved_id"] or "").strip()
+        try:
+            datetime.fromisoformat(timestamp)
+        except ValueError:
+            color_id, timestamp = color_id or timestamp, ""
+    timestamp = timestamp.isoformat() if isinstance(timestamp, datetime) else str(timestamp or "").strip()
+    return row_no, color_id, timestamp, _parse_favorite(fields.get("favorite")), percentages
+
+
+def iter_xlsx_rows(path, registry):
+    """Rows of the first worksheet below its header row, in openpyxl read-only mode."""
+    import openpyxl
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        columns = None
+        for row_no, values in enumerate(wb.worksheets[0].iter_rows(values_only=True), start=1):
+            if columns is None:
+                columns = _column_map(values, registry)
+                if columns is None and row_no >= IMPORT_HEADER_SCAN_ROWS:
+                    raise PaletteImportError(0, f"no pigment columns in the first {row_no} rows")
+                continue
+            fields = _row_fields(row_no, values, columns, registry, percent_scale=100.0)
+            if fields is not None:
+                yield fields
+        if columns is None:
+            raise PaletteImportError(0, "no pigment columns found")
+    finally:
+        wb.close()
+
+
+def iter_csv_rows(path, registry):
+    """Rows of a CSV file with a header row; the delimiter (",", ";" or tab) is detected."""
+    with open(path, 'r', newline='', encoding='utf-8-sig') as f:
+        try:
+            dialect = csv.Sniffer().sniff(f.read(4096), delimiters=",;\t")
+        except csv.Error:
+            dialect = csv.excel
+        f.seek(0)
+        reader = csv.reader(f, dialect)
+        columns = _column_map(next(reader, []), registry)
+        if columns is None:
+            raise PaletteImportError(1, "no pigment columns in the header row")
+        for values in reader:
+            fields = _row_fields(reader.line_num, values, columns, registry, percent_scale=1.0)
+            if fields is not None:
+                yield fields
+
+
+def _json_entry_fields(row_no, obj, registry):
+    if not isinstance(obj, dict):
+        raise PaletteImportError(row_no, "expected a JSON object")
+    recipe = obj.get("recipe", obj)
+    if not isinstance(recipe, dict):
+        raise PaletteImportError(row_no, "recipe must be a JSON object")
+    try:
+        percentages = [parse_percentage(recipe.get(key)) for key in registry.order]
+    except ValueError as e:
+        raise PaletteImportError(row_no, e) from None
+    return (row_no, str(obj.get("id") or ""), str(obj.get("timestamp") or ""), _parse_favorite(obj.get("favorite")),
+            percentages)
+
+
+def iter_json_rows(path, registry, json_lines):
+    """Entries of a JSON Lines file, one per line, or of a JSON array (the legacy saved palette file,
+    which is read whole). Each is a saved entry ({"id", "recipe", "favorite", "timestamp"}) or a bare recipe."""
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        if json_lines:
+            for row_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        obj = json.loads(line)
+                    except ValueError as e:
+                        raise PaletteImportError(row_no, e) from None
+                    yield _json_entry_fields(row_no, obj, registry)
+        else:
+            try:
+                entries = json.load(f)
+            except ValueError as e:
+                raise PaletteImportError(0, e) from None
+            for row_no, obj in enumerate(entries if isinstance(entries, list) else [entries], start=1):
+                yield _json_entry_fields(row_no, obj, registry)
+
+
+def iter_palette_rows(path, registry=None):
+    registry = registry or DEFAULT_REGISTRY
+    file_format = IMPORT_FORMATS.get(Path(path).suffix.lower())
+    if file_format is None:
+        raise PaletteImportError(0, f"unsupported file type '{Path(path).suffix}' "
+                                    f"(expected one of {', '.join(sorted(IMPORT_FORMATS))})")
+    if file_format == "xlsx":
+        return iter_xlsx_rows(path, registry)
+    if file_format == "csv":
+        return iter_csv_rows(path, registry)
+    return iter_json_rows(path, registry, json_lines=file_format == "jsonl")
+
+
+def read_palette_import(path, registry=None, existing=None, progress_callback=None, cancel_event=None):
+    """Reads, mixes and dedupes the palette at path.
+
+    existing maps the ids already in the palette to their entries. A row whose id is already there
+    (or appeared earlier in the file) is skipped unless its timestamp is newer. A row without an id
+    (the Excel export writes none) takes the id of the saved entry with the same timestamp and recipe,
+    else one derived from its timestamp and recipe; rows without a timestamp get the import time.
+    progress_callback(rows_read) is called every IMPORT_PROGRESS_EVERY rows. Returns
+    (entries, rows_read, duplicates_skipped), or None if cancel_event got set."""
+    registry = registry or DEFAULT_REGISTRY
+    existing = existing or {}
+    existing_ids = {(c.get('timestamp', ''), _recipe_key(c['recipe'], registry)): cid
+                    for cid, c in existing.items() if c.get('timestamp')}
+    imported_at = datetime.now().isoformat()
+    entries, rows_read, duplicates = {}, 0, 0
+
+    def mix_batch(batch):
+        nonlocal duplicates
+        rgb_rows = calculate_mixed_colors_batch(np.array([row[4] for row in batch], dtype=np.float64).reshape(
+            -1, len(registry)), registry).tolist()
+        for (_, color_id, timestamp, favorite, percentages), rgb in zip(batch, rgb_rows):
+            recipe = dict(zip(registry.order, percentages))
+            if not color_id and timestamp:
+                color_id = existing_ids.get((timestamp, _recipe_key(recipe, registry)), "")
+            if not color_id:
+                color_id = str(uuid.uuid5(IMPORT_ID_NAMESPACE, f"{timestamp}|{json.dumps(recipe, sort_keys=True)}"))
+            if color_id in existing or color_id in entries:
+                newest = max(existing[color_id].get('timestamp', '') if color_id in existing else "",
+                             entries[color_id]['timestamp'] if color_id in entries else "")
+                if not timestamp or timestamp <= newest:
+                    duplicates += 1
+                    continue
+            entries[color_id] = {"id": color_id, "recipe": recipe, "rgb": rgb, "hex": rgb_to_hex(rgb),
+                                 "favorite": favorite, "timestamp": timestamp or imported_at}
+
+    batch = []
+    for row in iter_palette_rows(path, registry):
+        batch.append(row)
+        rows_read += 1
+        if len(batch) >= IMPORT_BATCH_SIZE:
+            mix_batch(batch)
+            batch = []
+        if rows_read % IMPORT_PROGRESS_EVERY == 0:
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            if progress_callback is not None:
+                progress_callback(rows_read)
+    if batch:
+        mix_batch(batch)
+    return list(entries.values()), rows_read, duplicates
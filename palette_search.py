@@ -0,0 +1,233 @@
+"""Filter queries over the saved color palette, answered from sorted in-memory indexes."""
+import bisect
+import re
+
+import numpy as np
+
+from laasti_core import DEFAULT_REGISTRY
+
+_DATE = r"\d{4}-\d{2}(?:-\d{2})?"
+_NUMBER = r"\d+(?:[.,]\d+)?"
+_DATE_LAST = "\uffff"  # Sorts after every ISO timestamp sharing a date prefix
+
+
+class FilterSyntaxError(ValueError):
+    pass
+
+
+class PaletteFilter:
+    """A parsed filter: all clauses must hold. Text is a sequence of clauses, in any order:
+
+        #b08d            hex prefix
+        P.Bk.11 > 2%     pigment content (>, >=, <, <=, =), also "P.Bk.11 1-3%"; keys or short names
+        fav              favorites only (also ★)
+        2024-01..2024-03 timestamp range, either end optional; a bare date or month matches just that
+
+    Percentages accept a decimal comma and an optional "%"."""
+
+    def __init__(self, hex_prefix="", favorite_only=False, date_from=None, date_to=None, pigment_ranges=None):
+        self.hex_prefix = hex_prefix
+        self.favorite_only = favorite_only
+        self.date_from, self.date_to = date_from, date_to  # Inclusive ISO prefixes
+        self.pigment_ranges = pigment_ranges or {}  # key -> [low, low_inclusive, high, high_inclusive]
+
+    def __bool__(self):
+        return bool(self.hex_prefix or self.favorite_only or self.date_from or self.date_to or self.pigment_ranges)
+
+    @classmethod
+    def parse(cls, text, registry=None):
+        registry = registry or DEFAULT_REGISTRY
+        names = {key.lower(): key for key in registry.order}
+        names.update({registry.short_name(key).lower(): key for key in registry.order})
+        pigment = "|".join(re.escape(name) for name in sorted(names, key=len, reverse=True))
+        clause = re.compile(
+            rf"\s*(?:(?P<hex>#[0-9a-f]{{0,6}})(?![0-9a-z])"
+            rf"|(?P<fav>★|fav(?:orites?)?(?![a-z]))"
+            rf"|(?P<from>{_DATE})?\s*\.\.\s*(?P<to>{_DATE})?"
+            rf"|(?P<day>{_DATE})"
+            rf"|(?P<key>{pigment})\s*(?:(?P<op>>=|<=|>|<|=)\s*(?P<value>{_NUMBER})"
+            rf"|(?P<low>{_NUMBER})\s*-\s*(?P<high>{_NUMBER}))\s*%?)\s*", re.IGNORECASE)
+        query = cls()
+        pos, text = 0, text.strip()
+        while pos < len(text):
+            match = clause.match(text, pos)
+            if match is None or match.end() == pos:
+                raise FilterSyntaxError(f"Cannot read filter at '{text[pos:]}'")
+            pos = match.end()
+            if match["hex"] is not None:
+                query.hex_prefix = match["hex"][1:].lower()
+            elif match["fav"]:
+                query.favorite_only = True
+            elif match["day"]:
+                query.date_from = query.date_to = match["day"]
+            elif match["key"]:
+                query._add_pigment_clause(names[match["key"].lower()], match)
+            else:
+                query.date_from, query.date_to = match["from"], match["to"]
+        return query
+
+    def _add_pigment_clause(self, key, match):
+        bounds = self.pigment_ranges.setdefault(key, [None, True, None, True])
+        if match["op"] is None:
+            clauses = [(">=", match["low"]), ("<=", match["high"])]
+        else:
+            clauses = [(match["op"], match["value"])]
+        for op, text in clauses:
+            value = float(text.replace(',', '.'))
+            # Keep the tighter of the existing and the new bound on each side
+            if op in (">", ">=", "=") and (bounds[0] is None or value > bounds[0] or
+                                           (value == bounds[0] and op == ">")):
+                bounds[0:2] = [value, op != ">"]
+            if op in ("<", "<=", "=") and (bounds[2] is None or value < bounds[2] or
+                                           (value == bounds[2] and op == "<")):
+                bounds[2:4] = [value, op != "<"]
+
+
+class _SortedColumn:
+    """One indexed field: values in sorted order with the palette slot of each alongside, so a value
+    range is a searchsorted slice. Equal values are kept in tiebreak order when one is given."""
+
+    def __init__(self, dtype):
+        self.values = np.empty(0, dtype=dtype)
+        self.slots = np.empty(0, dtype=np.int64)
+
+    def add(self, value, slot, tiebreak=None):
+        pos = int(np.searchsorted(self.values, value, side='right'))
+        if tiebreak is not None:
+            lo = int(np.searchsorted(self.values, value, side='left'))
+            pos = lo + bisect.bisect_left([tiebreak(s) for s in self.slots[lo:pos].tolist()], tiebreak(slot))
+        self.values = np.insert(self.values, pos, value)
+        self.slots = np.insert(self.slots, pos, slot)
+
+    def remove(self, value, slot):
+        lo, hi = np.searchsorted(self.values, value, side='left'), np.searchsorted(self.values, value, side='right')
+        pos = lo + int(np.flatnonzero(self.slots[lo:hi] == slot)[0])
+        self.values = np.delete(self.values, pos)
+        self.slots = np.delete(self.slots, pos)
+
+    def bulk_load(self, values, slots, tiebreaks=None):
+        if tiebreaks is None:
+            order = np.argsort(values, kind='stable')
+        else:
+            order = np.array(sorted(range(len(values)), key=lambda i: (values[i], tiebreaks[i])), dtype=np.int64)
+        self.values, self.slots = values[order], np.asarray(slots, dtype=np.int64)[order]
+
+    def range(self, low, low_inclusive, high, high_inclusive):
+        start = 0 if low is None else np.searchsorted(self.values, low, side='left' if low_inclusive else 'right')
+        stop = len(self.values) if high is None else np.searchsorted(self.values, high,
+                                                                     side='right' if high_inclusive else 'left')
+        return self.slots[start:max(start, stop)]
+
+
+class PaletteSearchIndex:
+    """Sorted columns over hex, timestamp and each pigment's percentage, plus a favorite flag per
+    entry, kept in step with the palette through add/remove. Entries live in integer slots; a query
+    takes one searchsorted slice of slots per clause and counts hits per slot with numpy, so no
+    per-entry Python code runs. Results come back in palette display order (favorites first, then
+    by timestamp and id), read off the timestamp column, which is kept in (timestamp, id) order."""
+    GROWTH = 1024
+
+    def __init__(self, registry=None):
+        self.registry = registry or DEFAULT_REGISTRY
+        self.clear()
+
+    def clear(self):
+        self._slot_of = {}  # id -> slot
+        self._ids = []  # slot -> id (None for a free slot)
+        self._free = []
+        self._indexed = []  # slot -> the indexed values, for removal after the entry itself changed
+        self._favorite = np.zeros(0, dtype=bool)
+        self.hex = _SortedColumn(np.int64)
+        self.timestamp = _SortedColumn(object)
+        self.pigments = {key: _SortedColumn(np.float64) for key in self.registry.order}
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def _values(self, color_data):
+        try:
+            hex_val = int(color_data['hex'].lstrip('#')[:6], 16)
+        except ValueError:
+            hex_val = -1
+        return (hex_val, color_data.get('timestamp', ''), bool(color_data.get('favorite', False)),
+                tuple(float(color_data['recipe'].get(key, 0.0)) for key in self.registry.order))
+
+    def rebuild(self, entries):
+        self.clear()
+        for color_data in entries:
+            self._slot_of[color_data['id']] = len(self._ids)
+            self._ids.append(color_data['id'])
+            self._indexed.append(self._values(color_data))
+        slots = np.arange(len(self._ids), dtype=np.int64)
+        self._favorite = np.array([values[2] for values in self._indexed], dtype=bool)
+        self.hex.bulk_load(np.array([values[0] for values in self._indexed], dtype=np.int64), slots)
+        self.timestamp.bulk_load(np.array([values[1] for values in self._indexed], dtype=object),
+                                 slots, tiebreaks=self._ids)
+        percentages = np.array([values[3] for values in self._indexed], dtype=np.float64).reshape(
+            -1, len(self.registry))
+        for i, key in enumerate(self.registry.order):
+            self.pigments[key].bulk_load(percentages[:, i], slots)
+
+    def add(self, color_data):
+        color_id = color_data['id']
+        if color_id in self._slot_of:
+            slot, values = self._slot_of[color_id], self._values(color_data)
+            old_hex, old_timestamp, _, old_percentages = self._indexed[slot]
+            if (values[0], values[1], values[3]) == (old_hex, old_timestamp, old_percentages):
+                self._indexed[slot], self._favorite[slot] = values, values[2]  # Favorite toggles stay cheap
+                return
+            self.remove(color_id)
+        if self._free:
+            slot = self._free.pop()
+            self._ids[slot] = color_id
+        else:
+            slot = len(self._ids)
+            self._ids.append(color_id)
+            self._indexed.append(None)
+            if slot >= len(self._favorite):
+                self._favorite = np.append(self._favorite, np.zeros(self.GROWTH, dtype=bool))
+        self._slot_of[color_id] = slot
+        hex_val, timestamp, favorite, percentages = self._indexed[slot] = self._values(color_data)
+        self._favorite[slot] = favorite
+        self.hex.add(hex_val, slot)
+        self.timestamp.add(timestamp, slot, tiebreak=self._ids.__getitem__)
+        for key, value in zip(self.registry.order, percentages):
+            self.pigments[key].add(value, slot)
+
+    def remove(self, color_id):
+        slot = self._slot_of.pop(color_id, None)
+        if slot is None:
+            return
+        hex_val, timestamp, _, percentages = self._indexed[slot]
+        self.hex.remove(hex_val, slot)
+        self.timestamp.remove(timestamp, slot)
+        for key, value in zip(self.registry.order, percentages):
+            self.pigments[key].remove(value, slot)
+        self._favorite[slot] = False
+        self._ids[slot] = self._indexed[slot] = None
+        self._free.append(slot)
+
+    def search(self, query):
+        """Ids matching query in palette display order, or None when the query has no clauses."""
+        if not query:
+            return None
+        ranges = []
+        if query.hex_prefix:
+            width = 4 * (6 - len(query.hex_prefix))
+            low = int(query.hex_prefix, 16) << width
+            ranges.append(self.hex.range(low, True, low + (1 << width), False))
+        if query.date_from or query.date_to:
+            ranges.append(self.timestamp.range(query.date_from, True,
+                                               query.date_to and query.date_to + _DATE_LAST, False))
+        for key, bounds in query.pigment_ranges.items():
+            ranges.append(self.pigments[key].range(*bounds))
+        hits = np.zeros(len(self._ids), dtype=np.uint8)
+        for slots in ranges:
+            hits[slots] += 1
+        if query.favorite_only:
+            hits[:len(self._ids)] += self._favorite[:len(self._ids)]
+        matched = hits == len(ranges) + int(query.favorite_only)
+        in_order = self.timestamp.slots[matched[self.timestamp.slots]]
+        favorite = self._favorite[in_order]
+        ids = self._ids
+        return [ids[slot] for slot in np.concatenate((in_order[favorite], in_order[~favorite])).tolist()]
@@ -0,0 +1,191 @@
+"""SQLite-backed storage for the saved color palette, and a write-behind thread in front of it."""
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+
+class PaletteSchemaError(sqlite3.DatabaseError):
+    pass
+
+
+class PaletteStore:
+    """SQLite-backed store for saved colors, keyed by entry id.
+
+    Single-entry changes are single-row statements; the (favorite, timestamp) index serves the
+    palette's display order directly. On first open, entries from the legacy JSON file are
+    migrated in one transaction (the JSON file itself is left untouched) and the schema version is
+    stamped only once that succeeds, so a failed migration is retried on the next open.
+
+    Only the app's own open should create the schema: with create=False a database that has not
+    been set up (or migrated) yet raises PaletteSchemaError instead of being stamped empty."""
+    SCHEMA_VERSION = 1
+    COLUMNS = "id, recipe, rgb, hex, favorite, timestamp"
+
+    def __init__(self, db_path, legacy_json_path=None, create=True):
+        self.db_path = db_path
+        self.conn = sqlite3.connect(str(db_path))
+        try:
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] < self.SCHEMA_VERSION:
+                if not create:
+                    raise PaletteSchemaError(f"{db_path} has no palette schema yet (the saved colors have not "
+                                             f"been loaded or migrated)")
+                self._create_schema(legacy_json_path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+        except BaseException:
+            self.conn.close()
+            raise
+
+    def _create_schema(self, legacy_json_path):
+        with self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS colors (
+                id TEXT PRIMARY KEY, recipe TEXT NOT NULL, rgb TEXT NOT NULL, hex TEXT NOT NULL,
+                favorite INTEGER NOT NULL DEFAULT 0, timestamp TEXT NOT NULL DEFAULT '')""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS colors_display_order ON colors (favorite DESC, timestamp, id)")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS colors_timestamp ON colors (timestamp)")
+            if legacy_json_path is not None and Path(legacy_json_path).exists():
+                with open(legacy_json_path, 'r') as f:
+                    self.conn.executemany(f"INSERT OR REPLACE INTO colors ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                                          [self._to_row(c) for c in json.load(f)])
+            self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @staticmethod
+    def _to_row(color_data):
+        return (color_data['id'], json.dumps(color_data['recipe']), json.dumps(list(color_data['rgb'])),
+                color_data['hex'], int(bool(color_data.get('favorite', False))), color_data.get('timestamp', ''))
+
+    @staticmethod
+    def _from_row(row):
+        color_id, recipe, rgb, hex_val, favorite, timestamp = row
+        return {"id": color_id, "recipe": json.loads(recipe), "rgb": json.loads(rgb), "hex": hex_val,
+                "favorite": bool(favorite), "timestamp": timestamp}
+
+    def iter_sorted(self):
+        """Yields every entry in palette display order: favorites first, then oldest first."""
+        cursor = self.conn.execute(f"SELECT {self.COLUMNS} FROM colors ORDER BY favorite DESC, timestamp, id")
+        for row in cursor:
+            yield self._from_row(row)
+
+    def get(self, color_id):
+        row = self.conn.execute(f"SELECT {self.COLUMNS} FROM colors WHERE id = ?", (color_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM colors").fetchone()[0]
+
+    def write(self, upserts=(), deletes=()):
+        """Applies upserted entries and deleted ids in one transaction."""
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO colors ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                                  [self._to_row(c) for c in upserts])
+            self.conn.executemany("DELETE FROM colors WHERE id = ?", [(color_id,) for color_id in deletes])
+
+    def close(self):
+        self.conn.close()
+
+
+class PaletteWriter:
+    """Write-behind persistence for a PaletteStore, run on its own thread.
+
+    submit() only records the change and returns; the thread waits COALESCE_SECONDS after the first
+    pending change so a burst (star clicks, an import) lands in a single transaction, where the last
+    change per id wins. SQLite commits that transaction atomically through its WAL, so a crash leaves
+    either the previous palette or the new one, never a torn file. A failed flush keeps its changes
+    pending for a retry after RETRY_SECONDS and hands the exception to on_error, which is called on
+    the writer thread (the Tk app forwards it through a queue). close() flushes what is left.
+
+    The writer never creates the schema or migrates the legacy JSON: until a PaletteStore opened
+    with the legacy path has done that, every flush fails with PaletteSchemaError."""
+    COALESCE_SECONDS = 0.25
+    RETRY_SECONDS = 2.0
+
+    def __init__(self, db_path, on_error=None):
+        self.db_path = db_path
+        self.on_error = on_error
+        self._pending = {}  # id -> entry snapshot to upsert, or None to delete
+        self._lock = threading.Condition()
+        self._in_flight = False
+        self._flush_requested = False
+        self._closing = False
+        self.flush_count = 0
+        self._thread = threading.Thread(target=self._run, name="PaletteWriter", daemon=True)
+        self._thread.start()
+
+    def submit(self, upserts=(), deletes=()):
+        with self._lock:
+            for color_data in upserts:
+                self._pending[color_data['id']] = dict(color_data)  # Snapshot; the UI keeps editing its copy
+            for color_id in deletes:
+                self._pending[color_id] = None
+            self._lock.notify_all()
+
+    @property
+    def has_pending(self):
+        with self._lock:
+            return bool(self._pending) or self._in_flight
+
+    def flush(self, timeout=None):
+        """Blocks until everything submitted so far is written (or timeout). Returns True when written."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._lock:
+            self._flush_requested = True
+            self._lock.notify_all()
+            while self._pending or self._in_flight:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+            return True
+
+    def close(self, timeout=None):
+        """Flushes pending changes and stops the thread. Returns False if changes could not be written."""
+        with self._lock:
+            self._closing = True
+            self._lock.notify_all()
+        self._thread.join(timeout)
+        return not self.has_pending
+
+    def _run(self):
+        store = None
+        while True:
+            with self._lock:
+                while not self._pending and not self._closing:
+                    self._lock.wait()
+                if not self._pending and self._closing:
+                    break
+                deadline = time.monotonic() + self.COALESCE_SECONDS
+                while not (self._closing or self._flush_requested):  # Let the rest of the burst arrive
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self._lock.wait(remaining)
+                self._flush_requested = False
+                batch, self._pending = self._pending, {}
+                self._in_flight = True
+            try:
+                if store is None:
+                    store = PaletteStore(self.db_path, create=False)
+                store.write([c for c in batch.values() if c is not None],
+                            [color_id for color_id, c in batch.items() if c is None])
+                error = None
+            except Exception as e:
+                error = e
+            with self._lock:
+                self._in_flight = False
+                if error is None:
+                    self.flush_count += 1
+                else:
+                    for color_id, change in batch.items():  # Changes submitted meanwhile are newer; keep those
+                        self._pending.setdefault(color_id, change)
+                self._lock.notify_all()
+            if error is not None:
+                if self.on_error is not None:
+                    self.on_error(error)
+                with self._lock:
+                    if self._closing:
+                        break  # Give up rather than retry forever on shutdown; close() reports it
+                    self._lock.wait(self.RETRY_SECONDS)
+        if store is not None:
+            store.close()
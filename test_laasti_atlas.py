@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+import laasti_atlas
+from laasti_atlas import AtlasFormatError, ColorAtlas, read_atlas_header, sweep_atlas
+from laasti_core import calculate_mixed_color
+
+GRID_STEP = 0.5  # 21 levels per pigment, 194,481 recipes
+
+
+@pytest.fixture
+def atlas_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(laasti_atlas, "CHUNK_RECIPES", 1 << 14)  # 12 chunks
+    path = tmp_path / "atlas.bin"
+    assert sweep_atlas(path, grid_step=GRID_STEP, workers=2) == 12
+    return path
+
+
+def sample_rows(atlas, count=300, seed=1):
+    rows = np.random.default_rng(seed).integers(0, len(atlas), size=count).tolist()
+    return rows + [0, len(atlas) - 1]
+
+
+def test_atlas_rows_equal_the_scalar_mix(atlas_path):
+    atlas = ColorAtlas(atlas_path)
+    assert atlas.complete and len(atlas) == 21 ** 4
+    for row in sample_rows(atlas):
+        recipe = atlas.recipe_at(row)
+        assert atlas.colors[row].tolist() == [int(c) for c in calculate_mixed_color(recipe)]
+        assert atlas.index_of(recipe) == row
+
+
+def test_index_of_snaps_to_the_grid(atlas_path):
+    atlas = ColorAtlas(atlas_path)
+    assert atlas.index_of({"P.Y.42": 2.6, "P.Bk.11": 11.0}) == atlas.index_of({"P.Y.42": 2.5, "P.Bk.11": 10.0})
+    assert atlas.index_of({}) == 0
+
+
+def test_resume_redoes_only_unfinished_chunks(atlas_path):
+    header = read_atlas_header(atlas_path)
+    chunk_rows = header["chunk_recipes"]
+    expected = np.array(ColorAtlas(atlas_path).colors)
+    # Pretend the sweep died before chunks 1 and 5 were flushed: flags cleared, rows garbage
+    data = np.memmap(atlas_path, dtype=np.uint8, mode='r+', offset=header["data_offset"],
+                     shape=(header["recipes"], 3))
+    data[chunk_rows:2 * chunk_rows] = 7
+    data[5 * chunk_rows:6 * chunk_rows] = 7
+    done = np.memmap(atlas_path, dtype=np.uint8, mode='r+', offset=header["done_offset"], shape=(header["chunks"],))
+    done[[1, 5]] = 0
+    data.flush(), done.flush()
+    del data, done
+    assert not ColorAtlas(atlas_path).complete
+
+    progress = []
+    assert sweep_atlas(atlas_path, grid_step=GRID_STEP, workers=2,
+                       progress_callback=lambda finished, total: progress.append(finished)) == 2
+    assert progress == [10, 11, 12]
+    atlas = ColorAtlas(atlas_path)
+    assert atlas.complete and np.array_equal(atlas.colors, expected)
+    assert sweep_atlas(atlas_path, grid_step=GRID_STEP, workers=2) == 0
+
+
+def test_atlas_of_another_grid_is_refused(atlas_path):
+    with pytest.raises(AtlasFormatError):
+        sweep_atlas(atlas_path, grid_step=1.0, workers=1)
+
+
+def test_truncated_or_foreign_files_are_refused(atlas_path, tmp_path):
+    with open(atlas_path, 'r+b') as f:
+        f.truncate(laasti_atlas.HEADER_BYTES + 100)
+    with pytest.raises(AtlasFormatError):
+        ColorAtlas(atlas_path)
+    other = tmp_path / "other.bin"
+    other.write_bytes(b"\0" * 64)
+    with pytest.raises(AtlasFormatError):
+        read_atlas_header(other)
+
+
+def test_grid_step_must_divide_one_percent():
+    with pytest.raises(ValueError):
+        laasti_atlas.atlas_header(laasti_atlas.DEFAULT_REGISTRY, 0.3)
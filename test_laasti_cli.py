@@ -0,0 +1,35 @@
+import io
+import json
+
+from laasti_cli import OUTPUT_FIELDS, main
+from laasti_core import calculate_mixed_color, rgb_to_hex
+
+
+def run_cli(argv, text):
+    stdout, stderr = io.StringIO(), io.StringIO()
+    status = main(argv, stdin=io.StringIO(text), stdout=stdout, stderr=stderr)
+    return status, stdout.getvalue(), stderr.getvalue()
+
+
+def test_csv_in_csv_out():
+    status, out, _ = run_cli([], "id,P.Y.42,P.Bk.11\na,2,0.5\nb,,\n")
+    assert status == 0
+    lines = out.splitlines()
+    assert lines[0] == ",".join(OUTPUT_FIELDS)
+    assert lines[1].startswith("a,") and lines[1].endswith(rgb_to_hex(
+        calculate_mixed_color({"P.Y.42": 2, "P.Bk.11": 0.5})))
+    assert len(lines) == 3
+
+
+def test_unknown_csv_column_writes_no_output():
+    status, out, err = run_cli([], "id,P.Y.42,Cobalt\na,1,2\n")
+    assert status == 1
+    assert out == ""
+    assert "unknown column(s) Cobalt" in err
+
+
+def test_jsonl_out():
+    status, out, _ = run_cli(["--input-format", "jsonl", "--output-format", "jsonl"],
+                             '{"id": "x", "recipe": {"P.R.101": 3}}\n\n')
+    assert status == 0
+    assert json.loads(out)["hex"] == rgb_to_hex(calculate_mixed_color({"P.R.101": 3}))
@@ -0,0 +1,253 @@
+import json
+
+import numpy as np
+import pytest
+
+from laasti_core import (DEFAULT_REGISTRY, PIGMENT_CATALOG_ENV_VAR, PIGMENT_DATA, PIGMENT_ORDER, LabNeighborIndex,
+                         PigmentRegistry, RecipeMatchIndex, calculate_mixed_color, calculate_mixed_colors_batch,
+                         load_pigment_registry, rgb_array_to_lab)
+
+
+def write_catalog(path, pigments, **extra):
+    path.write_text(json.dumps(dict(extra, pigments=pigments)), encoding='utf-8')
+    return path
+
+
+def catalog_pigments():
+    return [dict(PIGMENT_DATA[key], key=key, rgb=list(PIGMENT_DATA[key]["rgb"])) for key in PIGMENT_ORDER]
+
+
+def test_catalog_matches_the_built_in_pigments(tmp_path):
+    registry = PigmentRegistry.from_catalog(write_catalog(tmp_path / "catalog.json", catalog_pigments()))
+    assert registry.order == PIGMENT_ORDER and registry.base_rgb == DEFAULT_REGISTRY.base_rgb
+    assert registry.fingerprint() == DEFAULT_REGISTRY.fingerprint()
+    recipe = {"P.Y.42": 3.0, "P.Bk.11": 0.5}
+    assert calculate_mixed_color(recipe, registry) == calculate_mixed_color(recipe)
+
+
+def test_catalog_order_and_mortar_base_are_honored(tmp_path):
+    pigments = catalog_pigments()[::-1]
+    del pigments[0]["name_full"]  # Optional; the key stands in for it
+    registry = PigmentRegistry.from_catalog(write_catalog(tmp_path / "catalog.json", pigments,
+                                                          mortar_base_rgb=[230, 220, 200]))
+    assert registry.order == PIGMENT_ORDER[::-1]
+    assert registry.base_rgb == (230, 220, 200) and registry.short_name("P.Bk.11") == "P.Bk.11"
+    assert calculate_mixed_color({}, registry) == (230, 220, 200)
+    assert registry.fingerprint() != DEFAULT_REGISTRY.fingerprint()
+
+
+@pytest.mark.parametrize("edit, message", [
+    (lambda catalog: catalog.pop("pigments"), "missing 'pigments'"),
+    (lambda catalog: catalog["pigments"][1].pop("key"), "missing 'key'"),
+    (lambda catalog: catalog["pigments"][1].pop("rgb"), "missing 'rgb'"),
+    (lambda catalog: catalog["pigments"][1].pop("intensity"), "missing 'intensity'"),
+    (lambda catalog: catalog["pigments"][1].update(rgb=[177, 66]), "rgb must be three values"),
+    (lambda catalog: catalog["pigments"][1].update(rgb=[177, 66, 256]), "rgb must be three values"),
+    (lambda catalog: catalog["pigments"][1].update(rgb=[177, -1, 36]), "rgb must be three values"),
+    (lambda catalog: catalog["pigments"][1].update(rgb="#b14224"), "rgb must be three values"),
+    (lambda catalog: catalog["pigments"][1].update(intensity=0), "intensity must be positive"),
+    (lambda catalog: catalog["pigments"][1].update(intensity=-5.0), "intensity must be positive"),
+    (lambda catalog: catalog["pigments"][1].update(intensity="a lot"), "could not convert"),
+    (lambda catalog: catalog["pigments"][2].update(key="P.R.101"), "keys must be unique"),
+    (lambda catalog: catalog.update(pigments=[]), "at least one pigment"),
+    (lambda catalog: catalog.update(mortar_base_rgb=[255, 255]), "mortar_base_rgb"),
+    (lambda catalog: catalog.update(mortar_base_rgb="white"), "mortar_base_rgb"),
+])
+def test_malformed_catalogs_are_rejected(tmp_path, edit, message):
+    catalog = {"pigments": catalog_pigments()}
+    edit(catalog)
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(catalog), encoding='utf-8')
+    with pytest.raises(ValueError, match=message):
+        PigmentRegistry.from_catalog(path)
+
+
+def test_catalog_that_is_not_json_is_rejected(tmp_path):
+    path = tmp_path / "catalog.json"
+    path.write_text('{"pigments": [', encoding='utf-8')
+    with pytest.raises(ValueError):
+        PigmentRegistry.from_catalog(path)
+    with pytest.raises(OSError):
+        PigmentRegistry.from_catalog(tmp_path / "missing.json")
+
+
+def test_load_pigment_registry_argument_then_environment_then_built_in(tmp_path, monkeypatch):
+    monkeypatch.delenv(PIGMENT_CATALOG_ENV_VAR, raising=False)
+    assert load_pigment_registry() is DEFAULT_REGISTRY
+    env_catalog = write_catalog(tmp_path / "env.json", catalog_pigments()[:2])
+    monkeypatch.setenv(PIGMENT_CATALOG_ENV_VAR, str(env_catalog))
+    assert load_pigment_registry().order == PIGMENT_ORDER[:2]
+    argument_catalog = write_catalog(tmp_path / "argument.json", catalog_pigments()[2:])
+    assert load_pigment_registry(argument_catalog).order == PIGMENT_ORDER[2:]
+    monkeypatch.setenv(PIGMENT_CATALOG_ENV_VAR, "")
+    assert load_pigment_registry() is DEFAULT_REGISTRY
+
+
+def test_app_falls_back_to_the_built_in_pigments(tmp_path, monkeypatch):
+    laastigithub = pytest.importorskip("laastigithub")
+    warnings = []
+    monkeypatch.setattr(laastigithub.messagebox, "showwarning", lambda title, text: warnings.append(text))
+    monkeypatch.delenv(PIGMENT_CATALOG_ENV_VAR, raising=False)
+    app = type("App", (), {"current_save_dir": tmp_path})()
+    assert laastigithub.PigmentMixerApp._load_pigment_registry(app) is DEFAULT_REGISTRY
+    assert not warnings
+
+    # A catalog in the save directory is picked up; a broken one warns and falls back
+    write_catalog(tmp_path / laastigithub.PIGMENT_CATALOG_FILE_NAME, catalog_pigments()[:1])
+    assert laastigithub.PigmentMixerApp._load_pigment_registry(app).order == PIGMENT_ORDER[:1]
+    write_catalog(tmp_path / laastigithub.PIGMENT_CATALOG_FILE_NAME, [{"key": "P.Y.42", "rgb": [1, 2, 3]}])
+    assert laastigithub.PigmentMixerApp._load_pigment_registry(app) is DEFAULT_REGISTRY
+    assert len(warnings) == 1 and "intensity" in warnings[0]
+    monkeypatch.setenv(PIGMENT_CATALOG_ENV_VAR, str(tmp_path / "missing.json"))
+    assert laastigithub.PigmentMixerApp._load_pigment_registry(app) is DEFAULT_REGISTRY
+    assert len(warnings) == 2 and "missing.json" in warnings[1]
+
+
+def test_batch_mix_equals_scalar_mix_exactly():
+    rng = np.random.default_rng(5)
+    random_recipes = rng.uniform(0, 10, size=(20_000, len(PIGMENT_ORDER)))
+    # Zeros (skipped by the scalar path), saturating amounts (alpha capped at 1) and negatives
+    edge_values = np.array([0.0, 0.05, 100.0 / 45.0, 4.5, 10.0, 50.0, -1.0])
+    edge_recipes = rng.choice(edge_values, size=(5_000, len(PIGMENT_ORDER)))
+    recipes = np.vstack([random_recipes, edge_recipes, np.zeros((1, len(PIGMENT_ORDER)))])
+    batch = calculate_mixed_colors_batch(recipes)
+    scalar = np.array([calculate_mixed_color(dict(zip(PIGMENT_ORDER, row))) for row in recipes.tolist()])
+    assert np.array_equal(batch, scalar)
+
+
+def test_batch_mix_accepts_one_recipe_and_rejects_wrong_widths():
+    recipe = [1.0, 2.0, 0.0, 0.5]
+    assert calculate_mixed_colors_batch(recipe).tolist() == [list(calculate_mixed_color(
+        dict(zip(PIGMENT_ORDER, recipe))))]
+    with pytest.raises(ValueError):
+        calculate_mixed_colors_batch(np.zeros((3, len(PIGMENT_ORDER) + 1)))
+
+
+@pytest.fixture(scope="module")
+def match_index():
+    return RecipeMatchIndex.build()
+
+
+def test_match_query_equals_brute_force_nearest(match_index):
+    rng = np.random.default_rng(11)
+    colors = match_index.colors.astype(np.float32)
+    for target in rng.integers(0, 256, size=(50, 3)).astype(np.float32):
+        expected = np.sort(np.sqrt(((colors - target) ** 2).sum(axis=1)))[:8]
+        results = match_index.query(target, k=8)
+        assert [d for d, _, _ in results] == pytest.approx(expected.tolist(), abs=1e-4)
+        for distance, recipe, rgb in results:
+            # Each hit's recipe really mixes to its color (up to the float32 storage of the colors)
+            assert calculate_mixed_color(recipe) == pytest.approx(rgb, abs=1e-3)
+
+
+def test_match_grid_stops_each_pigment_where_it_saturates(match_index):
+    step = match_index.grid_step
+    for key, levels, intensity in zip(PIGMENT_ORDER, RecipeMatchIndex.grid_levels(DEFAULT_REGISTRY, step),
+                                      DEFAULT_REGISTRY.intensity):
+        assert levels * step <= RecipeMatchIndex.MAX_PERCENT
+        # The last level already mixes to the same color as the slider maximum; one less does not
+        assert calculate_mixed_color({key: levels * step}) == calculate_mixed_color({key: RecipeMatchIndex.MAX_PERCENT})
+        assert (levels - 1) * step * intensity / 100.0 < 1.0
+
+
+def test_match_index_collapses_same_color_recipes(match_index):
+    # Keys from the float64 mix the build collapsed on (the stored float32 colors can round differently)
+    colors = calculate_mixed_colors_batch(match_index.levels * match_index.grid_step)
+    keys = np.round(colors / RecipeMatchIndex.COLOR_RESOLUTION).astype(np.int64)
+    assert len(np.unique(keys, axis=0)) == len(keys)
+    # The unmixed base color is reached by the empty recipe, not by some saturated pigment mix
+    distance, recipe, _ = match_index.query(DEFAULT_REGISTRY.base_rgb, k=1)[0]
+    assert distance == 0 and not any(recipe.values())
+
+
+def test_match_query_k_larger_than_index():
+    registry = PigmentRegistry({"P.Bk.11": dict(PIGMENT_DATA["P.Bk.11"], intensity=100.0)}, ["P.Bk.11"])
+    index = RecipeMatchIndex.build(registry)
+    assert len(index.query((128, 128, 128), k=1000)) == len(index.colors)
+
+
+def test_load_or_build_reuses_cache_until_the_model_changes(tmp_path, monkeypatch):
+    cache_path = tmp_path / "match_index.npz"
+    builds = []
+    real_build = RecipeMatchIndex.build.__func__
+    monkeypatch.setattr(RecipeMatchIndex, "build",
+                        classmethod(lambda cls, registry=None: builds.append(registry) or real_build(cls, registry)))
+    small = PigmentRegistry({key: PIGMENT_DATA[key] for key in PIGMENT_ORDER[:2]}, PIGMENT_ORDER[:2])
+
+    first = RecipeMatchIndex.load_or_build(cache_path, small)
+    assert len(builds) == 1 and cache_path.exists()
+    cached = RecipeMatchIndex.load_or_build(cache_path, small)
+    assert len(builds) == 1
+    assert np.array_equal(cached.colors, first.colors) and np.array_equal(cached.levels, first.levels)
+    assert cached.query((120, 80, 50), k=3) == first.query((120, 80, 50), k=3)
+
+    changed = PigmentRegistry({key: dict(PIGMENT_DATA[key], intensity=30.0) for key in PIGMENT_ORDER[:2]},
+                              PIGMENT_ORDER[:2])
+    rebuilt = RecipeMatchIndex.load_or_build(cache_path, changed)
+    assert len(builds) == 2 and rebuilt.fingerprint != first.fingerprint
+    assert RecipeMatchIndex.load_or_build(cache_path, changed).fingerprint == rebuilt.fingerprint
+    assert len(builds) == 2
+
+
+def test_load_or_build_rebuilds_an_unreadable_cache(tmp_path):
+    cache_path = tmp_path / "match_index.npz"
+    cache_path.write_bytes(b"not an npz file")
+    index = RecipeMatchIndex.load_or_build(cache_path)
+    assert len(index.colors) and np.load(cache_path)["fingerprint"] == index.fingerprint
+
+
+def brute_force_neighbors(ids, points, target, max_delta_e, limit):
+    distances = np.sqrt(((points - np.asarray(target, dtype=np.float64)) ** 2).sum(axis=1))
+    return sorted((float(d), color_id) for d, color_id in zip(distances, ids) if d <= max_delta_e)[:limit]
+
+
+def assert_neighbors_agree(index, labs, targets):
+    assert len(index) == len(labs)
+    ids = list(labs)
+    points = np.array([labs[color_id] for color_id in ids], dtype=np.float64)
+    for target in targets:
+        for max_delta_e in (0.5, 2.3, 6.0):
+            for limit in (1, 5, 50):
+                found = index.query(target, max_delta_e, limit=limit)
+                expected = brute_force_neighbors(ids, points, target, max_delta_e, limit)
+                # Among exactly tied distances either id may take the last places; the distances may not differ
+                assert [d for d, _ in found] == [d for d, _ in expected]
+                for distance, color_id in found:
+                    assert distance == brute_force_neighbors([color_id], np.array([labs[color_id]]), target,
+                                                             np.inf, 1)[0][0]
+
+
+def test_lab_neighbors_equal_brute_force_after_edits():
+    rng = np.random.default_rng(9)
+    index, labs = LabNeighborIndex(), {}
+    rgb = rng.integers(0, 256, size=(20_000, 3))
+    ids = [f"c{i}" for i in range(len(rgb))]
+    index.add_many(ids, rgb)
+    labs.update(zip(ids, map(tuple, rgb_array_to_lab(rgb).tolist())))
+    crowded = tuple(rgb_array_to_lab([(176, 141, 106)])[0].tolist())
+    for i in range(300):  # One crowded cell of identical colors, and near-identical ones around it
+        index.add(f"same{i}", crowded)
+        labs[f"same{i}"] = crowded
+        near = tuple((np.array(crowded) + rng.normal(0, 0.8, 3)).tolist())
+        index.add(f"near{i}", near)
+        labs[f"near{i}"] = near
+    for color_id in rng.choice(list(labs), size=6000, replace=False).tolist():
+        index.remove(color_id)
+        del labs[color_id]
+    for color_id in list(labs)[::7]:  # Re-adding an id moves it to its new color
+        lab = tuple(rgb_array_to_lab([rng.integers(0, 256, size=3)])[0].tolist())
+        index.add(color_id, lab)
+        labs[color_id] = lab
+    index.remove("not-there")
+    targets = [crowded] + [tuple(lab) for lab in rgb_array_to_lab(rng.integers(0, 256, size=(40, 3))).tolist()]
+    assert_neighbors_agree(index, labs, targets)
+
+
+def test_lab_neighbors_limit_cuts_a_crowded_cell():
+    index = LabNeighborIndex()
+    for i in range(500):
+        index.add(i, (50.0, 10.0, 20.0))
+    index.add("close", (50.0, 10.0, 21.0))
+    assert [d for d, _ in index.query((50.0, 10.0, 20.0), 2.3, limit=5)] == [0.0] * 5
+    assert index.query((50.0, 10.0, 22.0), 1.0, limit=1) == [(1.0, "close")]
+    assert index.query((90.0, 0.0, 0.0), 2.3) == []
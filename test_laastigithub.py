@@ -0,0 +1,118 @@
+import queue
+import threading
+from pathlib import Path
+
+import pytest
+
+laastigithub = pytest.importorskip("laastigithub")
+
+
+class FakeWriter:
+    def __init__(self, flush_results):
+        self.flush_results = list(flush_results)
+        self.closed = False
+
+    def flush(self, timeout=None):
+        return self.flush_results.pop(0)
+
+    def close(self, timeout=None):
+        self.closed = True
+        return True
+
+
+class FakeRoot:
+    destroyed = False
+
+    def __init__(self):
+        self.scheduled = []
+
+    def destroy(self):
+        self.destroyed = True
+
+    def after(self, ms, callback, *args):
+        self.scheduled.append((callback, args))
+
+
+class FakeWidget:
+    def __init__(self):
+        self.calls = []
+
+    def __getattr__(self, method):
+        return lambda *args, **kwargs: self.calls.append((method, args, kwargs))
+
+
+def closing_app(monkeypatch, flush_results, answers, with_job=True):
+    """An app without a window: just the state on_close touches, and the user's answers queued up."""
+    app = laastigithub.PigmentMixerApp.__new__(laastigithub.PigmentMixerApp)
+    app.root, app.palette_writer, app.palette_db_path = FakeRoot(), FakeWriter(flush_results), Path("palette.sqlite3")
+    app._jobs = {}
+    if with_job:
+        app._jobs["export"] = {"cancel": threading.Event(), "thread": threading.Thread(target=lambda: None)}
+        app._jobs["export"]["thread"].start()
+    app.export_cancel = app._jobs["export"]["cancel"] if with_job else None
+    app.questions = []
+    monkeypatch.setattr(laastigithub.messagebox, "askyesno",
+                        lambda title, text: app.questions.append(text) or answers.pop(0))
+    return app
+
+
+def test_staying_open_leaves_the_running_job_alone(monkeypatch):
+    app = closing_app(monkeypatch, flush_results=[False], answers=[False])
+    app.on_close()
+    assert len(app.questions) == 1
+    assert not app.export_cancel.is_set()
+    assert not app.palette_writer.closed and not app.root.destroyed
+
+
+def test_quitting_anyway_cancels_the_job_and_asks_once(monkeypatch):
+    app = closing_app(monkeypatch, flush_results=[False], answers=[True])
+    app.on_close()
+    assert len(app.questions) == 1
+    assert app.export_cancel.is_set()
+    assert app.palette_writer.closed and app.root.destroyed
+
+
+def test_changes_handed_over_by_a_cancelled_job_are_checked_too(monkeypatch):
+    app = closing_app(monkeypatch, flush_results=[True, False], answers=[False])
+    app.on_close()
+    assert len(app.questions) == 1 and app.export_cancel.is_set()
+    assert not app.root.destroyed
+
+    app = closing_app(monkeypatch, flush_results=[True], answers=[], with_job=False)
+    app.on_close()
+    assert app.palette_writer.closed and app.root.destroyed
+
+
+def polled_job(messages):
+    app = laastigithub.PigmentMixerApp.__new__(laastigithub.PigmentMixerApp)
+    app.root, app.seen = FakeRoot(), []
+    job = {"cancel": threading.Event(), "messages": queue.Queue(), "dialog": FakeWidget(), "status": FakeWidget(),
+           "cancel_button": FakeWidget(), "on_message": lambda job, kind, payload: app.seen.append((kind, payload)),
+           "on_outcome": lambda job, kind, payload: app.seen.append(("outcome", kind, payload))}
+    for message in messages:
+        job["messages"].put(message)
+    app._jobs = {"import": job}
+    return app, job
+
+
+def test_poll_routes_reports_then_ends_the_job_once():
+    app, job = polled_job([("progress", 10), ("saving", 3)])
+    app._poll_background_job("import")
+    assert app.seen == [("progress", 10), ("saving", 3)]
+    assert app.root.scheduled == [(app._poll_background_job, ("import",))] and "import" in app._jobs
+
+    job["cancel"].set()
+    job["messages"].put(("done", "payload"))
+    app._poll_background_job("import")
+    assert app.seen[2:] == [("outcome", "done", "payload")]
+    assert job["dialog"].calls == [("destroy", (), {})] and app._jobs == {}
+    assert len(app.root.scheduled) == 1  # Not polled again
+
+
+def test_poll_shows_a_pending_cancel():
+    app, job = polled_job([])
+    job["cancel"].set()
+    app._poll_background_job("import")
+    assert job["status"].calls == [("config", (), {"text": "Cancelling..."})]
+    assert job["cancel_button"].calls == [("state", (["disabled"],), {})]
+    assert "import" in app._jobs
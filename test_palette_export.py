@@ -0,0 +1,33 @@
+import glob
+import os
+import tempfile
+import threading
+
+from palette_export import EXPORT_PROGRESS_EVERY, write_palette_xlsx
+
+
+def openpyxl_temp_files():
+    return set(glob.glob(os.path.join(tempfile.gettempdir(), "openpyxl.*")))
+
+
+def test_cancelled_export_leaves_no_files(tmp_path, make_palette):
+    cancel_event = threading.Event()
+
+    def cancel_midway(done, total):
+        if done >= 3 * EXPORT_PROGRESS_EVERY:
+            cancel_event.set()
+
+    before = openpyxl_temp_files()
+    path = tmp_path / "export.xlsx"
+    assert write_palette_xlsx(path, make_palette(3000), progress_callback=cancel_midway,
+                              cancel_event=cancel_event) is False
+    assert list(tmp_path.iterdir()) == []
+    assert openpyxl_temp_files() - before == set()
+
+
+def test_finished_export_leaves_only_the_workbook(tmp_path, make_palette):
+    before = openpyxl_temp_files()
+    path = tmp_path / "export.xlsx"
+    assert write_palette_xlsx(path, make_palette(20)) is True
+    assert list(tmp_path.iterdir()) == [path]
+    assert openpyxl_temp_files() - before == set()
@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+from laasti_core import DEFAULT_REGISTRY, calculate_mixed_color, rgb_to_hex
+from palette_export import write_palette_xlsx
+from palette_import import read_palette_import
+
+
+def test_reimporting_an_excel_export_adds_nothing(tmp_path, make_palette):
+    palette = make_palette(300)
+    path = tmp_path / "export.xlsx"
+    write_palette_xlsx(path, palette)
+    entries, rows_read, duplicates = read_palette_import(path, existing={c['id']: c for c in palette})
+    assert (len(entries), rows_read, duplicates) == (0, 300, 300)
+
+
+def test_excel_export_round_trips_into_an_empty_palette(tmp_path, make_palette):
+    palette = make_palette(50)
+    path = tmp_path / "export.xlsx"
+    write_palette_xlsx(path, palette)
+    entries, _, _ = read_palette_import(path)
+    by_timestamp = {c['timestamp']: c for c in palette}
+    assert len(entries) == len(palette)
+    for entry in entries:
+        original = by_timestamp[entry['timestamp']]
+        assert entry['recipe'] == original['recipe']
+        assert (entry['hex'], entry['favorite']) == (original['hex'], original['favorite'])
+
+
+def test_newer_row_replaces_saved_entry(tmp_path, make_palette):
+    palette = make_palette(2)
+    newer = dict(palette[0], timestamp="2030-01-01T00:00:00")
+    path = tmp_path / "palette.jsonl"
+    path.write_text("\n".join(json.dumps(c) for c in (newer, palette[1])) + "\n", encoding="utf-8")
+    entries, rows_read, duplicates = read_palette_import(path, existing={c['id']: c for c in palette})
+    assert [e['id'] for e in entries] == [newer['id']]
+    assert (rows_read, duplicates) == (2, 1)
+
+
+@pytest.mark.parametrize("value, expected", [("false", False), ("", False), ("0", False), (0, False),
+                                             ("true", True), ("yes", True), ("★", True), (1, True),
+                                             (True, True)])
+def test_json_favorite_strings(tmp_path, value, expected):
+    path = tmp_path / "palette.jsonl"
+    path.write_text(json.dumps({"recipe": {"P.Y.42": 1}, "favorite": value}) + "\n", encoding="utf-8")
+    entries, _, _ = read_palette_import(path)
+    assert entries[0]['favorite'] is expected
+
+
+def test_semicolon_csv_with_decimal_commas(tmp_path):
+    path = tmp_path / "lims.csv"
+    header = ";".join(["Sample", "timestamp"] + [f"{key} (%)" for key in DEFAULT_REGISTRY.order])
+    path.write_text(f"{header}\nS1;2024-05-01T10:00:00;2,5;0;1,0;0\n", encoding="utf-8")
+    entries, _, _ = read_palette_import(path)
+    assert list(entries[0]['recipe'].values()) == [2.5, 0.0, 1.0, 0.0]
+    assert entries[0]['hex'] == rgb_to_hex(calculate_mixed_color(entries[0]['recipe']))
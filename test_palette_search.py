@@ -0,0 +1,121 @@
+import random
+
+import pytest
+
+from laasti_core import DEFAULT_REGISTRY, calculate_mixed_color, rgb_to_hex
+from palette_search import FilterSyntaxError, PaletteFilter, PaletteSearchIndex
+
+QUERIES = ["#", "#b", "#4", "#59", "#522", "fav", "★ #5", "2024-01", "2024-01-03", "2024-01-02..2024-01-04",
+           "..2024-01-02", "2024-02..", "P.Y.42 > 5", "P.Y.42 >= 5", "P.R.101 < 2,5%", "P.R.101 <= 2.5",
+           "P.Bk.11 = 1", "Caput Mortuum 1-3%", "P.Y.42 > 2 P.Y.42 < 4", "fav P.Bk.11 > 0 2024-01-02..",
+           "#3a2 P.R.101 0.5-9.5 fav", "P.Y.42 > 10"]
+
+
+def matches(entry, query):
+    """The filter semantics, evaluated entry by entry."""
+    if not entry['hex'].lstrip('#').lower().startswith(query.hex_prefix):
+        return False
+    if query.favorite_only and not entry['favorite']:
+        return False
+    timestamp = entry['timestamp']
+    if query.date_from and timestamp < query.date_from:
+        return False
+    if query.date_to and timestamp[:len(query.date_to)] > query.date_to:
+        return False
+    for key, (low, low_inclusive, high, high_inclusive) in query.pigment_ranges.items():
+        value = entry['recipe'][key]
+        if low is not None and (value < low if low_inclusive else value <= low):
+            return False
+        if high is not None and (value > high if high_inclusive else value >= high):
+            return False
+    return True
+
+
+def brute_force(palette, query):
+    if not query:
+        return None
+    ordered = sorted(palette.values(), key=lambda c: (not c['favorite'], c['timestamp'], c['id']))
+    return [c['id'] for c in ordered if matches(c, query)]
+
+
+def random_entry(rng, color_id):
+    # Coarse recipes and repeated timestamps, so hex prefixes, range bounds and timestamp ties all get hit
+    recipe = {key: rng.choice([0.0, 0.5, 1.0, 2.5, 3.0, 5.0, 9.5, 10.0]) for key in DEFAULT_REGISTRY.order}
+    rgb = calculate_mixed_color(recipe)
+    day, minute = rng.randint(1, 40), rng.randint(0, 5)
+    timestamp = f"2024-{1 + (day - 1) // 31:02d}-{1 + (day - 1) % 31:02d}T10:{minute:02d}:00"
+    return {"id": color_id, "recipe": recipe, "rgb": rgb, "hex": rgb_to_hex(rgb),
+            "favorite": rng.random() < 0.2, "timestamp": timestamp}
+
+
+def assert_index_agrees(index, palette):
+    assert len(index) == len(palette)
+    for text in QUERIES:
+        query = PaletteFilter.parse(text)
+        assert index.search(query) == brute_force(palette, query), text
+
+
+def test_search_matches_brute_force_after_incremental_edits():
+    rng = random.Random(3)
+    palette = {}
+    for i in range(3000):
+        entry = random_entry(rng, f"id{rng.randrange(10 ** 6):06d}-{i}")
+        palette[entry['id']] = entry
+    index = PaletteSearchIndex()
+    index.rebuild(palette.values())
+    assert_index_agrees(index, palette)
+
+    next_id = 3000
+    for _ in range(600):
+        action = rng.random()
+        if action < 0.35:  # Add; freed slots get reused
+            entry = random_entry(rng, f"id{rng.randrange(10 ** 6):06d}-{next_id}")
+            next_id += 1
+            palette[entry['id']] = entry
+            index.add(entry)
+        elif action < 0.7:
+            color_id = rng.choice(list(palette))
+            del palette[color_id]
+            index.remove(color_id)
+        elif action < 0.9:  # Favorite toggle, the cheap in-place update
+            entry = palette[rng.choice(list(palette))]
+            entry['favorite'] = not entry['favorite']
+            index.add(entry)
+        else:  # Same id, new recipe and timestamp
+            color_id = rng.choice(list(palette))
+            palette[color_id] = random_entry(rng, color_id)
+            index.add(palette[color_id])
+    assert_index_agrees(index, palette)
+
+
+def test_empty_filter_searches_nothing():
+    index = PaletteSearchIndex()
+    assert not PaletteFilter.parse("   ")
+    assert index.search(PaletteFilter.parse("")) is None
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("#B08D", {"hex_prefix": "b08d"}),
+    ("favorites", {"favorite_only": True}),
+    ("2024-01-05", {"date_from": "2024-01-05", "date_to": "2024-01-05"}),
+    ("2024-01..", {"date_from": "2024-01", "date_to": None}),
+    ("P.Bk.11 1,5-3%", {"pigment_ranges": {"P.Bk.11": [1.5, True, 3.0, True]}}),
+    ("P.Y.42 > 2 P.Y.42 >= 2", {"pigment_ranges": {"P.Y.42": [2.0, False, None, True]}}),
+    ("P.Y.42 < 4 P.Y.42 = 3", {"pigment_ranges": {"P.Y.42": [3.0, True, 3.0, True]}}),
+])
+def test_parse(text, expected):
+    query = PaletteFilter.parse(text)
+    for attribute, value in expected.items():
+        assert getattr(query, attribute) == value
+
+
+def test_parse_accepts_short_names():
+    key = DEFAULT_REGISTRY.order[2]
+    query = PaletteFilter.parse(f"{DEFAULT_REGISTRY.short_name(key).upper()} <= 4")
+    assert query.pigment_ranges == {key: [None, True, 4.0, True]}
+
+
+@pytest.mark.parametrize("text", ["P.Y.42 >", "blue", "#b08d1234", "P.Y.42 > 2 %%"])
+def test_parse_rejects(text):
+    with pytest.raises(FilterSyntaxError):
+        PaletteFilter.parse(text)
@@ -0,0 +1,192 @@
+import json
+import sqlite3
+import time
+
+import pytest
+
+from palette_store import PaletteSchemaError, PaletteStore, PaletteWriter
+
+
+def entry(color_id, favorite=False, timestamp="2024-01-01T10:00:00"):
+    return {"id": color_id, "recipe": {"P.Y.42": 1.0}, "rgb": [200, 180, 120], "hex": "#c8b478",
+            "favorite": favorite, "timestamp": timestamp}
+
+
+def stored(db_path, legacy_json_path=None):
+    store = PaletteStore(db_path, legacy_json_path=legacy_json_path)
+    try:
+        return {c['id']: c for c in store.iter_sorted()}
+    finally:
+        store.close()
+
+
+def user_version(db_path):
+    conn = sqlite3.connect(str(db_path))
+    try:
+        return conn.execute("PRAGMA user_version").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """A palette database set up the way the app's own load leaves it, ready for the writer."""
+    path = tmp_path / "palette.sqlite3"
+    PaletteStore(path).close()
+    return path
+
+
+@pytest.fixture(autouse=True)
+def fast_writer(monkeypatch):
+    monkeypatch.setattr(PaletteWriter, "COALESCE_SECONDS", 0.02)
+    monkeypatch.setattr(PaletteWriter, "RETRY_SECONDS", 0.05)
+
+
+@pytest.fixture
+def failing_store(monkeypatch):
+    """Makes PaletteStore.write raise while state["fail"] is set; state["during_write"], if set, runs
+    inside each write before it fails or goes through."""
+    state = {"fail": True, "attempts": 0, "during_write": None}
+    real_write = PaletteStore.write
+
+    def write(self, upserts=(), deletes=()):
+        state["attempts"] += 1
+        if state["during_write"] is not None:
+            state["during_write"]()
+        if state["fail"]:
+            raise sqlite3.OperationalError("disk I/O error")
+        real_write(self, upserts, deletes)
+
+    monkeypatch.setattr(PaletteStore, "write", write)
+    return state
+
+
+def test_burst_is_coalesced_and_last_change_per_id_wins(db_path, monkeypatch):
+    monkeypatch.setattr(PaletteWriter, "COALESCE_SECONDS", 60)  # Only flush() ends the burst
+    writer = PaletteWriter(db_path)
+    try:
+        a = entry("a")
+        writer.submit(upserts=[a, entry("b")])
+        a['favorite'] = True  # The writer keeps its own snapshot...
+        writer.submit(upserts=[entry("a", timestamp="2024-02-01T10:00:00")])  # ...and the last submit wins
+        writer.submit(deletes=["b"])
+        writer.submit(upserts=[entry("c")])
+        assert writer.flush(timeout=5)
+        assert writer.flush_count == 1
+    finally:
+        writer.close(timeout=5)
+    saved = stored(db_path)
+    assert sorted(saved) == ["a", "c"]
+    assert saved["a"]["timestamp"] == "2024-02-01T10:00:00" and not saved["a"]["favorite"]
+
+
+def test_failed_write_keeps_changes_and_retries(db_path, failing_store):
+    errors = []
+    writer = PaletteWriter(db_path, on_error=errors.append)
+    try:
+        writer.submit(upserts=[entry("a"), entry("b")])
+        assert not writer.flush(timeout=0.3)
+        assert failing_store["attempts"] >= 2  # Retried after RETRY_SECONDS
+        assert errors and all(isinstance(e, sqlite3.OperationalError) for e in errors)
+        assert writer.has_pending
+
+        failing_store["fail"] = False
+        assert writer.flush(timeout=5)
+        assert not writer.has_pending
+    finally:
+        writer.close(timeout=5)
+    assert sorted(stored(db_path)) == ["a", "b"]
+
+
+def test_change_submitted_during_a_failed_write_is_not_overwritten(db_path, failing_store):
+    writer = PaletteWriter(db_path)
+
+    def submit_newer_then_recover():
+        failing_store["during_write"] = None
+        writer.submit(upserts=[entry("a", favorite=True)], deletes=["b"])  # While the old batch is in flight
+        failing_store["during_write"] = lambda: failing_store.update(fail=False)
+
+    failing_store["during_write"] = submit_newer_then_recover
+    try:
+        writer.submit(upserts=[entry("a"), entry("b")])
+        assert writer.flush(timeout=5)
+    finally:
+        writer.close(timeout=5)
+    saved = stored(db_path)
+    assert sorted(saved) == ["a"]
+    assert saved["a"]["favorite"]
+
+
+def test_flush_times_out_while_writes_keep_failing(db_path, failing_store):
+    writer = PaletteWriter(db_path)
+    try:
+        writer.submit(upserts=[entry("a")])
+        start = time.monotonic()
+        assert writer.flush(timeout=0.2) is False
+        assert 0.2 <= time.monotonic() - start < 2
+    finally:
+        assert writer.close(timeout=5) is False  # Gives up on shutdown and says so
+    assert not writer._thread.is_alive()
+
+
+def test_close_writes_what_is_still_pending(db_path, monkeypatch):
+    monkeypatch.setattr(PaletteWriter, "COALESCE_SECONDS", 60)  # Nothing is written before close()
+    writer = PaletteWriter(db_path)
+    writer.submit(upserts=[entry("a"), entry("b")])
+    writer.submit(deletes=["b"])
+    start = time.monotonic()
+    assert writer.close(timeout=5) is True
+    assert time.monotonic() - start < 5
+    assert sorted(stored(db_path)) == ["a"]
+
+
+def test_legacy_json_is_migrated_once(tmp_path):
+    db_path, json_path = tmp_path / "palette.sqlite3", tmp_path / "saved_colors.json"
+    json_path.write_text(json.dumps([entry("a", favorite=True), entry("b")]))
+    store = PaletteStore(db_path, legacy_json_path=json_path)
+    try:
+        assert [c['id'] for c in store.iter_sorted()] == ["a", "b"]
+    finally:
+        store.close()
+    assert user_version(db_path) == PaletteStore.SCHEMA_VERSION
+
+    json_path.write_text(json.dumps([entry("c")]))  # The JSON file is not read again after the migration
+    store = PaletteStore(db_path, legacy_json_path=json_path)
+    try:
+        store.write(deletes=["b"])
+    finally:
+        store.close()
+    assert sorted(stored(db_path)) == ["a"]
+
+
+def test_failed_migration_stays_pending_while_the_writer_runs(tmp_path):
+    db_path, json_path = tmp_path / "palette.sqlite3", tmp_path / "saved_colors.json"
+    legacy = json.dumps([entry("a"), entry("b")])
+    json_path.write_text(legacy[:-20])  # Truncated mid-entry
+    with pytest.raises(ValueError):
+        PaletteStore(db_path, legacy_json_path=json_path)
+    assert user_version(db_path) == 0
+
+    # The app keeps running on an empty palette; the writer must not stamp the schema behind its back
+    errors = []
+    writer = PaletteWriter(db_path, on_error=errors.append)
+    try:
+        writer.submit(upserts=[entry("new")])
+        assert not writer.flush(timeout=0.3)
+        assert errors and all(isinstance(e, PaletteSchemaError) for e in errors)
+    finally:
+        assert writer.close(timeout=5) is False
+    assert user_version(db_path) == 0
+
+    json_path.write_text(legacy)  # Repaired: the next proper open migrates after all
+    assert sorted(stored(db_path, json_path)) == ["a", "b"]
+    assert user_version(db_path) == PaletteStore.SCHEMA_VERSION
+
+
+def test_store_without_create_refuses_a_new_database(tmp_path):
+    db_path = tmp_path / "palette.sqlite3"
+    with pytest.raises(PaletteSchemaError):
+        PaletteStore(db_path, create=False)
+    assert user_version(db_path) == 0
+    PaletteStore(db_path).close()
+    PaletteStore(db_path, create=False).close()
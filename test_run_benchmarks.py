@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent / "benchmarks"))
+
+from run_benchmarks import MEMORY_NOISE_MB, compare_to_baseline  # noqa: E402
+
+BASELINE = {"export[100]": {"ops_per_second": 1000.0, "p50_ms": 1.0, "p95_ms": 2.0, "peak_memory_mb": 40.0},
+            "search[100]": {"ops_per_second": 1000.0, "p50_ms": 1.0, "p95_ms": 2.0, "peak_memory_mb": 0.1}}
+
+
+def result(**changes):
+    return dict(BASELINE["export[100]"], **changes)
+
+
+def test_each_metric_regresses_past_the_tolerance_only():
+    assert compare_to_baseline({"export[100]": result(p50_ms=1.2, p95_ms=2.4, peak_memory_mb=49.0,
+                                                      ops_per_second=800.0)}, BASELINE, 0.25) == []
+    regressions = compare_to_baseline({"export[100]": result(p50_ms=1.3, p95_ms=2.6, peak_memory_mb=51.0,
+                                                             ops_per_second=700.0)}, BASELINE, 0.25)
+    assert [line.split(": ")[1].split()[0] for line in regressions] == ["p50", "p95", "700", "peak"]
+
+
+def test_small_peaks_need_real_growth_and_old_baselines_still_compare():
+    tiny = dict(BASELINE["search[100]"], peak_memory_mb=0.1 + MEMORY_NOISE_MB * 0.9)
+    assert compare_to_baseline({"search[100]": tiny}, BASELINE, 0.25) == []
+    old = {"export[100]": {"ops_per_second": 1000.0, "p50_ms": 1.0}}  # Recorded before p95/peak were checked
+    assert compare_to_baseline({"export[100]": result(p95_ms=9.0, peak_memory_mb=99.0)}, old, 0.25) == []